@@ -2,29 +2,66 @@
 OCR AutoFill Backend API — Precision Line-Position Extraction
 """
 
-import re
 import io
-import requests
-from typing import Optional, List, Dict, Tuple
-from PIL import Image
-import pytesseract
+import os
+# Tesseract's OpenMP threads thrash under concurrent requests — must be set before tesserocr loads.
+# Parallelism comes from engine threads and worker processes instead.
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+import queue
+import bisect
+import asyncio
+import threading
+import aiohttp
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from typing import Optional, List, Tuple, Dict, Set, Union
+from blake3 import blake3
+from cachetools import TTLCache
+from tesserocr import PyTessBaseAPI, PSM, OEM, RIL, iterate_level
 import cv2
 import numpy as np
+from PIL import Image
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from rules import extract_fields
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def _env_workers(name: str) -> int:
+    """Positive worker count from the environment; unset, malformed or < 1 means 1."""
+    value = os.environ.get(name) or "1"
+    try:
+        return max(int(value), 1)
+    except ValueError:
+        logger.warning(f"Ignoring non-integer {name}={value!r}; using 1")
+        return 1
+
+# Uvicorn worker processes (same variable uvicorn reads for --workers); the cores
+# are split between them so each process sizes its OCR concurrency accordingly.
+WEB_CONCURRENCY = _env_workers("WEB_CONCURRENCY")
+OCR_THREADS = max((os.cpu_count() or 4) // WEB_CONCURRENCY, 1)
+
 app = FastAPI(title="OCR AutoFill API", version="2.0.0")
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
 
 # ── Models ────────────────────────────────────────────────────────────────────
 
+# Images per /ocr/batch request — bounds download memory (up to MAX_IMAGE_BYTES each)
+# and the OCR work a single request can queue
+MAX_BATCH_IMAGES = 10
+
 class OCRRequest(BaseModel):
     image_url: str
+    high_quality: bool = False   # Non-Local Means denoising — much slower, for very noisy scans
+
+class OCRBatchRequest(BaseModel):
+    image_urls: List[str] = Field(max_length=MAX_BATCH_IMAGES)
+    high_quality: bool = False
 
 class OCRResponse(BaseModel):
     first_name: Optional[str] = None
@@ -45,727 +82,512 @@ class OCRResponse(BaseModel):
     ip: Optional[str] = None
     raw_text: Optional[str] = None
     confidence: Optional[float] = None
-
-# ── Fixed field order (matches the document's line layout) ────────────────────
-
-FIELD_ORDER = [
-    'first_name',      # Line 1
-    'last_name',       # Line 2
-    'email',           # Line 3
-    'ssn',             # Line 4
-    'phone',           # Line 5
-    'bank_name',       # Line 6
-    'account_no',      # Line 7
-    'loan_amount',     # Line 8
-    'address',         # Line 9
-    'city',            # Line 10
-    'state',           # Line 11
-    'zip',             # Line 12
-    'dob',             # Line 13
-    'licence_no',      # Line 14
-    'licence_state',   # Line 15
-    'ip',              # Line 16
-]
-
-# ── Valid US state codes ──────────────────────────────────────────────────────
-
-VALID_STATES = {
-    'AL','AK','AZ','AR','CA','CO','CT','DE','FL','GA','HI','ID','IL','IN','IA',
-    'KS','KY','LA','ME','MD','MA','MI','MN','MS','MO','MT','NE','NV','NH','NJ',
-    'NM','NY','NC','ND','OH','OK','OR','PA','RI','SC','SD','TN','TX','UT','VT',
-    'VA','WA','WV','WI','WY','DC','PR','VI','GU','AS','MP',
-}
-
-# ── Common OCR character confusions ──────────────────────────────────────────
-
-OCR_DIGIT_FIXES = str.maketrans({'O': '0', 'o': '0', 'I': '1', 'l': '1',
-                                  'S': '5', 's': '5', 'B': '8', 'b': '8',
-                                  'Z': '2', 'z': '2', 'G': '6', 'g': '9',
-                                  'T': '7', 'D': '0', 'Q': '0', 'A': '4'})
-
-OCR_ALPHA_FIXES = str.maketrans({'0': 'O', '1': 'I', '5': 'S', '8': 'B',
-                                  '2': 'Z', '6': 'G', '9': 'g', '7': 'T',
-                                  '4': 'A', '3': 'E'})
-
-
-# ── Per-field validators & cleaners ──────────────────────────────────────────
-
-def _clean_for_digits(s: str) -> str:
-    """Remove all non-digit characters, fixing common OCR alpha→digit errors."""
-    fixed = s.translate(OCR_DIGIT_FIXES)
-    return re.sub(r'[^0-9]', '', fixed)
-
-def _clean_for_alpha(s: str) -> str:
-    """Remove non-alpha characters, fixing common OCR digit→alpha errors."""
-    fixed = s.translate(OCR_ALPHA_FIXES)
-    return re.sub(r'[^A-Za-z ]', '', fixed).strip()
-
-def validate_first_name(val: str) -> Tuple[str, float]:
-    cleaned = re.sub(r'[^A-Za-z\s\'-]', '', val).strip()
-    if cleaned and len(cleaned) >= 1:
-        return cleaned.upper(), 1.0
-    alpha = _clean_for_alpha(val)
-    if alpha:
-        return alpha.upper(), 0.7
-    return val.strip().upper(), 0.3
-
-def validate_last_name(val: str) -> Tuple[str, float]:
-    return validate_first_name(val)  # Same logic
-
-def validate_email(val: str) -> Tuple[str, float]:
-    # Fix common OCR errors in email
-    cleaned = val.strip().lower()
-    cleaned = cleaned.replace(' ', '')
-    cleaned = cleaned.replace(',', '.')
-    cleaned = cleaned.replace('(a)', '@').replace('[at]', '@')
-    cleaned = cleaned.replace('@@', '@')
-    # Fix common OCR: 'rn' misread as 'm', etc.
-    if '@' in cleaned and '.' in cleaned:
-        return cleaned, 1.0
-    # Try to find email pattern in a messy string
-    m = re.search(r'[a-zA-Z0-9._%+\-]+@[a-zA-Z0-9.\-]+\.[a-zA-Z]{2,}', cleaned)
-    if m:
-        return m.group(0), 0.9
-    return cleaned, 0.3
-
-def validate_ssn(val: str) -> Tuple[str, float]:
-    digits = _clean_for_digits(val)
-    if len(digits) == 9:
-        return digits, 1.0
-    # If we got close (8 or 10 digits), try to fix
-    if len(digits) == 10:
-        return digits[:9], 0.7
-    if len(digits) == 8:
-        return digits, 0.5
-    # Strip formatting like XXX-XX-XXXX
-    stripped = re.sub(r'[\-\s]', '', val)
-    digits2 = _clean_for_digits(stripped)
-    if len(digits2) == 9:
-        return digits2, 0.9
-    return digits if digits else val.strip(), 0.3
-
-def validate_phone(val: str) -> Tuple[str, float]:
-    digits = _clean_for_digits(val)
-    # Remove country code prefix
-    if len(digits) == 11 and digits[0] == '1':
-        digits = digits[1:]
-    if len(digits) == 10:
-        return digits, 1.0
-    if len(digits) == 9:
-        return digits, 0.6
-    # Try stripping formatting
-    stripped = re.sub(r'[\-\(\)\s\+]', '', val)
-    digits2 = _clean_for_digits(stripped)
-    if len(digits2) == 11 and digits2[0] == '1':
-        digits2 = digits2[1:]
-    if len(digits2) == 10:
-        return digits2, 0.9
-    return digits if digits else val.strip(), 0.3
-
-def validate_bank_name(val: str) -> Tuple[str, float]:
-    # Allow digits (e.g., "Citizens 1st Bank", "First 2nd Bank")
-    cleaned = re.sub(r'[^A-Za-z0-9\s\.\&\'-]', '', val).strip()
-    if cleaned and len(cleaned) >= 3:
-        return cleaned, 1.0
-    # Fallback: keep anything that looks like words
-    words = re.sub(r'[^A-Za-z0-9\s]', '', val).strip()
-    if words and len(words) >= 3:
-        return words, 0.7
-    return val.strip(), 0.3
-
-def validate_account_no(val: str) -> Tuple[str, float]:
-    digits = _clean_for_digits(val)
-    if 6 <= len(digits) <= 17:
-        return digits, 1.0
-    return digits if digits else val.strip(), 0.3
-
-def validate_loan_amount(val: str) -> Tuple[str, float]:
-    # Remove $ sign and commas
-    cleaned = val.replace('$', '').replace(',', '').strip()
-    digits = _clean_for_digits(cleaned)
-    if digits and 1 <= len(digits) <= 10:
-        return digits, 1.0
-    # Try extracting just the number
-    m = re.search(r'[\d]+', cleaned)
-    if m:
-        return m.group(0), 0.8
-    return val.strip(), 0.3
-
-# Common street suffixes and their OCR-corrupted versions
-STREET_SUFFIX_FIXES = {
-    '5T': 'ST', '5t': 'ST', '$T': 'ST', 'S7': 'ST',
-    '4VE': 'AVE', '4ve': 'AVE', 'AV3': 'AVE', 'AVF': 'AVE',
-    '8LVD': 'BLVD', 'BLVO': 'BLVD', 'B1VD': 'BLVD',
-    'DR1VE': 'DRIVE', 'DR1': 'DR',
-    'LM': 'LN', '1N': 'LN',
-    'C7': 'CT', 'C1': 'CT',
-    'P1': 'PL', 'PK': 'PL',
-    'RO': 'RD', 'R0': 'RD',
-    'WAV': 'WAY', 'W4Y': 'WAY',
-}
-
-DIRECTION_FIXES = {
-    'M': 'N', 'W': 'W', '5': 'S', '3': 'E',
-    'NW': 'NW', 'NE': 'NE', 'SW': 'SW', 'SE': 'SE',
-}
-
-def _fix_address_ocr(addr: str) -> str:
-    """Fix common OCR errors in address street suffixes and directions."""
-    parts = addr.split()
-    fixed_parts = []
-    for i, part in enumerate(parts):
-        upper = part.upper()
-        # Fix street suffixes (usually last word or near-last)
-        if upper in STREET_SUFFIX_FIXES:
-            fixed_parts.append(STREET_SUFFIX_FIXES[upper])
-        else:
-            fixed_parts.append(part)
-    return ' '.join(fixed_parts)
-
-def validate_address(val: str) -> Tuple[str, float]:
-    cleaned = val.strip()
-    if not cleaned:
-        return val.strip(), 0.3
-    # Fix OCR errors in street suffixes
-    cleaned = _fix_address_ocr(cleaned)
-    # Address should start with a number
-    if re.match(r'^\d+\s+', cleaned):
-        return cleaned, 1.0
-    # Try to fix leading digit OCR errors (e.g., 'l121' -> '1121')
-    fixed = _clean_for_digits(cleaned.split()[0]) + ' ' + ' '.join(cleaned.split()[1:]) if cleaned.split() else cleaned
-    if re.match(r'^\d+\s+', fixed):
-        return fixed, 0.8
-    return cleaned, 0.5
-
-def validate_city(val: str) -> Tuple[str, float]:
-    # Cities are purely alphabetic — fix any OCR digit-to-alpha confusions
-    cleaned = val.strip()
-    
-    # If no digits, it's clean
-    pure_alpha = re.sub(r'[^A-Za-z\s\.\-]', '', cleaned).strip()
-    if pure_alpha and len(pure_alpha) >= 2 and not re.search(r'\d', cleaned):
-        return pure_alpha.upper(), 1.0
-    
-    # Has digits — likely OCR errors; convert digits to closest letters
-    fixed = cleaned.translate(OCR_ALPHA_FIXES)
-    fixed = re.sub(r'[^A-Za-z\s\.\-]', '', fixed).strip()
-    if fixed and len(fixed) >= 2:
-        return fixed.upper(), 0.8
-    
-    # Last resort: just strip non-alpha
-    alpha = _clean_for_alpha(cleaned)
-    if alpha:
-        return alpha.upper(), 0.7
-    return val.strip().upper(), 0.3
-
-def validate_state(val: str) -> Tuple[str, float]:
-    cleaned = val.strip().upper()
-    
-    # Direct match (perfect case)
-    pure = re.sub(r'[^A-Z]', '', cleaned)
-    if pure in VALID_STATES:
-        return pure, 1.0
-    
-    # First 2 alpha chars
-    if len(pure) >= 2 and pure[:2] in VALID_STATES:
-        return pure[:2], 0.9
-    
-    # Fix OCR digit→alpha errors (e.g., '4Z' → 'AZ', 'M0' → 'MO')
-    fixed = cleaned.translate(OCR_ALPHA_FIXES)
-    fixed_pure = re.sub(r'[^A-Z]', '', fixed.upper())
-    if fixed_pure in VALID_STATES:
-        return fixed_pure, 0.8
-    if len(fixed_pure) >= 2 and fixed_pure[:2] in VALID_STATES:
-        return fixed_pure[:2], 0.75
-    
-    # Fuzzy: try all single-character substitutions
-    for i in range(min(len(pure), 2)):
-        for c in 'ABCDEFGHIJKLMNOPQRSTUVWXYZ':
-            candidate = pure[:i] + c + pure[i+1:]
-            if len(candidate) >= 2 and candidate[:2] in VALID_STATES:
-                return candidate[:2], 0.6
-    
-    return pure if pure else val.strip().upper(), 0.3
-
-def validate_zip(val: str) -> Tuple[str, float]:
-    digits = _clean_for_digits(val)
-    if len(digits) >= 5:
-        return digits[:5], 1.0
-    if len(digits) == 4:
-        return digits, 0.6
-    return digits if digits else val.strip(), 0.3
-
-def validate_dob(val: str) -> Tuple[str, float]:
-    cleaned = val.strip()
-    # Check YYYY-MM-DD
-    m = re.match(r'^(\d{4})[/\-\.](\d{1,2})[/\-\.](\d{1,2})$', cleaned)
-    if m:
-        return f"{m.group(1)}-{m.group(2).zfill(2)}-{m.group(3).zfill(2)}", 1.0
-    # Check MM/DD/YYYY or DD/MM/YYYY
-    m = re.match(r'^(\d{1,2})[/\-\.](\d{1,2})[/\-\.](\d{4})$', cleaned)
-    if m:
-        return f"{m.group(3)}-{m.group(1).zfill(2)}-{m.group(2).zfill(2)}", 0.9
-    # Try to extract date-like pattern from messy text
-    digits = _clean_for_digits(cleaned)
-    if len(digits) == 8:
-        # Could be YYYYMMDD or MMDDYYYY
-        if digits[:2] in ('19', '20'):
-            return f"{digits[:4]}-{digits[4:6]}-{digits[6:]}", 0.8
-        else:
-            return f"{digits[4:]}-{digits[:2]}-{digits[2:4]}", 0.7
-    return cleaned, 0.3
-
-# Map of OCR digit→letter fixes specifically for licence number leading char
-LICENCE_FIRST_CHAR_FIXES = {
-    '0': 'O', '1': 'I', '2': 'Z', '3': 'E', '4': 'A',
-    '5': 'S', '6': 'G', '7': 'T', '8': 'B', '9': 'P',
-}
-
-def validate_licence_no(val: str) -> Tuple[str, float]:
-    """Licence numbers are alphanumeric; usually start with a letter."""
-    cleaned = re.sub(r'[\s\-]', '', val).strip()
-    
-    if not cleaned:
-        return val.strip().upper(), 0.3
-    
-    result = cleaned.upper()
-    conf = 1.0
-    
-    # Most US licence numbers start with a letter. If OCR turned it into a digit,
-    # try to recover — but ONLY for longer values (7+ chars) where we expect
-    # a letter prefix. Short values like "92" should be kept as-is.
-    if result and result[0].isdigit() and len(result) >= 7:
-        # Check if the rest is all digits — then the first char was likely a letter
-        if result[1:].replace(' ', '').isdigit():
-            fixed_char = LICENCE_FIRST_CHAR_FIXES.get(result[0], result[0])
-            result = fixed_char + result[1:]
-            conf = 0.7
-    
-    # Accept any length — licence numbers vary widely by state
-    if len(result) >= 1:
-        return result, conf
-    return result, 0.5
-
-def validate_licence_state(val: str) -> Tuple[str, float]:
-    return validate_state(val)  # Same validation as state
-
-def validate_ip(val: str) -> Tuple[str, float]:
-    cleaned = val.strip()
-    # Standard IPv4 match
-    m = re.match(r'^(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})$', cleaned)
-    if m:
-        return m.group(1), 1.0
-    # Try to fix OCR errors in IP (e.g., spaces instead of dots)
-    # Replace common OCR confusions
-    fixed = cleaned.replace(' ', '.').replace(',', '.').replace('..', '.')
-    fixed = re.sub(r'[^0-9\.]', '', fixed)
-    m = re.match(r'^(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})$', fixed)
-    if m:
-        return m.group(1), 0.8
-    # Try extracting from broader text
-    m = re.search(r'(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})', fixed)
-    if m:
-        return m.group(1), 0.7
-    return cleaned, 0.3
-
-# Map field names to validators
-FIELD_VALIDATORS = {
-    'first_name': validate_first_name,
-    'last_name': validate_last_name,
-    'email': validate_email,
-    'ssn': validate_ssn,
-    'phone': validate_phone,
-    'bank_name': validate_bank_name,
-    'account_no': validate_account_no,
-    'loan_amount': validate_loan_amount,
-    'address': validate_address,
-    'city': validate_city,
-    'state': validate_state,
-    'zip': validate_zip,
-    'dob': validate_dob,
-    'licence_no': validate_licence_no,
-    'licence_state': validate_licence_state,
-    'ip': validate_ip,
-}
-
+    error: Optional[str] = None   # /ocr/batch only: why this image has no result
 
 # ── Image download ───────────────────────────────────────────────────────────
 
-def download_image(url: str) -> Image.Image:
+@app.on_event("startup")
+async def open_http_session():
+    # One pooled session for the app's lifetime (keep-alive, no per-request handshake)
+    app.state.http = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=100),
+        headers={'User-Agent': 'Mozilla/5.0'},
+        timeout=aiohttp.ClientTimeout(total=30),
+    )
+
+@app.on_event("shutdown")
+async def close_http_session():
+    await app.state.http.close()
+
+MAX_IMAGE_BYTES = 25_000_000
+DOWNLOAD_CHUNK_SIZE = 1 << 16
+
+async def download_image(url: str) -> bytes:
+    """Fetch the raw image bytes (decoding is deferred until after the cache check)."""
+    too_large = HTTPException(status_code=413, detail="Image too large")
     try:
-        response = requests.get(url, headers={'User-Agent': 'Mozilla/5.0'}, timeout=30, verify=False)
-        response.raise_for_status()
-        return Image.open(io.BytesIO(response.content))
+        async with app.state.http.get(url) as response:
+            response.raise_for_status()
+            # Reject oversized images up front when the server declares the size...
+            if (response.content_length or 0) > MAX_IMAGE_BYTES:
+                raise too_large
+            # ...and enforce the cap while streaming when it doesn't (or lies)
+            buf = bytearray()
+            async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                buf += chunk
+                if len(buf) > MAX_IMAGE_BYTES:
+                    raise too_large
+            return bytes(buf)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+def decode_gray(data: bytes) -> np.ndarray:
+    """Decode image bytes straight to a grayscale array — no PIL image or RGB copy."""
+    if not data:
+        raise HTTPException(status_code=400, detail="Unsupported or corrupt image")
+    try:
+        gray = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_GRAYSCALE)
+    except cv2.error:
+        raise HTTPException(status_code=400, detail="Unsupported or corrupt image")
+    if gray is None:
+        # Formats OpenCV has no codec for (GIF, ...): let PIL produce the luma plane directly
+        try:
+            img = Image.open(io.BytesIO(data))
+            gray = np.asarray(img if img.mode == 'L' else img.convert('L'))
+        except Exception:
+            raise HTTPException(status_code=400, detail="Unsupported or corrupt image")
+    return gray
+
 
 # ── Image preprocessing (multiple strategies) ────────────────────────────────
 
-def _upscale_if_small(gray: np.ndarray) -> np.ndarray:
-    """Upscale small images for better OCR accuracy."""
+# Full-frame uint8 outputs are written into per-thread buffers that are only
+# reallocated when the image size changes, instead of a fresh array per pass.
+_scratch = threading.local()
+
+def _scratch_buffer(name: str, shape: Tuple[int, ...]) -> np.ndarray:
+    """Return this thread's reusable uint8 buffer `name`, (re)allocated to `shape`."""
+    buf = getattr(_scratch, name, None)
+    if buf is None or buf.shape != shape:
+        buf = np.empty(shape, dtype=np.uint8)
+        setattr(_scratch, name, buf)
+    return buf
+
+# Pixel kernels run on the GPU when OpenCV is built with CUDA (the pip wheels
+# are CPU-only, so this is normally False and the CPU path is used).
+USE_CUDA = cv2.cuda.getCudaEnabledDeviceCount() > 0
+logger.info(f"Image preprocessing on {'CUDA' if USE_CUDA else 'CPU'}")
+
+def _to_gpu(gray: np.ndarray) -> "cv2.cuda_GpuMat":
+    gpu = cv2.cuda_GpuMat()
+    gpu.upload(gray)
+    return gpu
+
+# Long-side bounds for OCR input. Past ~300 DPI Tesseract gains no accuracy,
+# but its runtime keeps growing with pixel count.
+OCR_MIN_LONG_SIDE = 900
+OCR_MAX_LONG_SIDE = 2000
+# Only downscale when clearly oversized: a 2100px scan isn't worth a resampling pass
+OCR_DOWNSCALE_SLACK = 1.25
+
+def _resize_for_ocr(gray: np.ndarray) -> np.ndarray:
+    """Upscale small images and downscale very large ones into Tesseract's sweet spot."""
     h, w = gray.shape
-    if h < 1000 or w < 1000:
-        scale = max(1500 / h, 1500 / w)
-        gray = cv2.resize(gray, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_CUBIC)
-    return gray
-
-def _to_gray(img: Image.Image) -> np.ndarray:
-    """Convert PIL image to grayscale numpy array."""
-    arr = np.array(img.convert('RGB'))
-    return cv2.cvtColor(arr, cv2.COLOR_RGB2GRAY)
-
-def preprocess_binary(img: Image.Image) -> np.ndarray:
+    long_side = max(h, w)
+    if long_side < OCR_MIN_LONG_SIDE:
+        scale, interp = OCR_MIN_LONG_SIDE / long_side, cv2.INTER_CUBIC
+    elif long_side > OCR_MAX_LONG_SIDE * OCR_DOWNSCALE_SLACK:
+        scale, interp = OCR_MAX_LONG_SIDE / long_side, cv2.INTER_AREA
+    else:
+        return gray
+    size = (max(1, int(w * scale)), max(1, int(h * scale)))
+    if USE_CUDA:
+        return cv2.cuda.resize(_to_gpu(gray), size, interpolation=interp).download()
+    return cv2.resize(gray, size, interpolation=interp)
+
+# Noise estimate (std-dev of the Laplacian) bands used by _denoise
+NOISE_CLEAN_MAX = 8.0       # below: screenshots / PDF renders — no denoise needed
+NOISE_BORDERLINE_MAX = 16.0 # below: light speckle — a 3x3 median is enough
+
+def _denoise(gray: np.ndarray) -> np.ndarray:
+    """Denoise only as much as the image needs; clean inputs pass through untouched."""
+    noise = cv2.meanStdDev(cv2.Laplacian(gray, cv2.CV_16S))[1][0, 0]
+    if noise < NOISE_CLEAN_MAX:
+        return gray
+    if noise < NOISE_BORDERLINE_MAX:
+        return cv2.medianBlur(gray, 3)
+    # Edge-preserving — bilateral filter is ~50x cheaper than Non-Local Means
+    if USE_CUDA:
+        return cv2.cuda.bilateralFilter(_to_gpu(gray), 5, 50, 50).download()
+    return cv2.bilateralFilter(gray, 5, 50, 50)
+
+def _denoise_nlm(gray: np.ndarray) -> np.ndarray:
+    """Non-Local Means — strongest on heavy noise, but seconds per image (high_quality only)."""
+    return cv2.fastNlMeansDenoising(gray, None, 10, 7, 21)
+
+def _clahe() -> "cv2.CLAHE":
+    """This thread's CLAHE instance — it keeps internal buffers, so it isn't shared across threads."""
+    clahe = getattr(_scratch, 'clahe', None)
+    if clahe is None:
+        clahe = _scratch.clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+    return clahe
+
+_SHARPEN_KERNEL = np.array([[-1, -1, -1], [-1, 9, -1], [-1, -1, -1]])
+
+def preprocess_binary(gray: np.ndarray, denoise=_denoise) -> np.ndarray:
     """Pass 1: CLAHE + denoise + Otsu binary threshold."""
-    gray = _to_gray(img)
-    gray = _upscale_if_small(gray)
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-    enhanced = clahe.apply(gray)
-    denoised = cv2.fastNlMeansDenoising(enhanced, None, 10, 7, 21)
-    _, binary = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    enhanced = _clahe().apply(gray)
+    denoised = denoise(enhanced)
+    _, binary = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU,
+                              dst=_scratch_buffer('binary', denoised.shape))
     return binary
 
-def preprocess_adaptive(img: Image.Image) -> np.ndarray:
+def preprocess_adaptive(gray: np.ndarray, denoise=_denoise) -> np.ndarray:
     """Pass 2: Adaptive threshold — better for uneven lighting."""
-    gray = _to_gray(img)
-    gray = _upscale_if_small(gray)
-    denoised = cv2.fastNlMeansDenoising(gray, None, 10, 7, 21)
+    denoised = denoise(gray)
     binary = cv2.adaptiveThreshold(denoised, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                    cv2.THRESH_BINARY, 31, 10)
+                                    cv2.THRESH_BINARY, 31, 10,
+                                    dst=_scratch_buffer('adaptive', denoised.shape))
     return binary
 
-def preprocess_sharp(img: Image.Image) -> np.ndarray:
+def preprocess_sharp(gray: np.ndarray) -> np.ndarray:
     """Pass 3: Sharpen + simple threshold — good for clean documents."""
-    gray = _to_gray(img)
-    gray = _upscale_if_small(gray)
-    # Sharpen
-    kernel = np.array([[-1, -1, -1], [-1, 9, -1], [-1, -1, -1]])
-    sharpened = cv2.filter2D(gray, -1, kernel)
-    _, binary = cv2.threshold(sharpened, 128, 255, cv2.THRESH_BINARY)
+    sharpened = cv2.filter2D(gray, -1, _SHARPEN_KERNEL)
+    _, binary = cv2.threshold(sharpened, 128, 255, cv2.THRESH_BINARY,
+                              dst=_scratch_buffer('sharp', sharpened.shape))
     return binary
 
-def preprocess_raw(img: Image.Image) -> np.ndarray:
-    """Pass 4: Minimal preprocessing — just upscale, no filters."""
-    gray = _to_gray(img)
-    gray = _upscale_if_small(gray)
+def preprocess_raw(gray: np.ndarray) -> np.ndarray:
+    """Pass 4: Minimal preprocessing — the resized image as-is, no filters."""
     return gray
 
 
 # ── OCR text extraction ──────────────────────────────────────────────────────
 
 OCR_CONFIGS = [
-    r'--oem 3 --psm 6 -l eng',   # Block of text
-    r'--oem 3 --psm 4 -l eng',   # Single column
-    r'--oem 3 --psm 3 -l eng',   # Fully automatic
+    PSM.SINGLE_BLOCK,    # Block of text
+    PSM.SINGLE_COLUMN,   # Single column
+    PSM.AUTO,            # Fully automatic
 ]
 
-def extract_text_single(processed: np.ndarray, config: str) -> str:
-    """Run Tesseract on a preprocessed image with a specific config."""
-    return pytesseract.image_to_string(processed, config=config)
+# In-process Tesseract engines (no subprocess / temp files per call), kept alive
+# for the process lifetime so the LSTM model is loaded once per engine.
+# The C++ API is not thread-safe, so each engine is used by one thread at a time;
+# engines are created on demand, up to one per core available to this process.
+_TESS_POOL: "queue.LifoQueue[PyTessBaseAPI]" = queue.LifoQueue()
+_TESS_SLOTS = threading.BoundedSemaphore(OCR_THREADS)
+
+@contextmanager
+def _tess_api():
+    """Borrow an idle Tesseract engine from the pool, creating one if none is idle."""
+    with _TESS_SLOTS:
+        try:
+            api = _TESS_POOL.get_nowait()
+        except queue.Empty:
+            api = PyTessBaseAPI(lang='eng', oem=OEM.DEFAULT)
+        try:
+            yield api
+        finally:
+            _TESS_POOL.put(api)
 
-def extract_text_multi_pass(img: Image.Image) -> List[str]:
-    """Run multiple preprocessing + OCR config combinations, return all results."""
+def extract_text_stacked(processed: np.ndarray, offsets: List[int], psm: int) -> List[Tuple[str, float]]:
+    """
+    Run Tesseract once on a canvas of vertically stacked images (a single image
+    is a stack of one). Reads the structured per-line results rather than the
+    flat page text, so lines are split back per image by their y-position and
+    each image gets Tesseract's own mean line confidence (0-100).
+    Returns (text, confidence) per image.
+    """
+    lines = [[] for _ in offsets]
+    confs = [[] for _ in offsets]
+    with _tess_api() as api:
+        h, w = processed.shape
+        api.SetPageSegMode(psm)
+        api.SetImageBytes(processed.tobytes(), w, h, 1, w)
+        api.Recognize()
+        iterator = api.GetIterator()
+        if iterator is not None:
+            for line in iterate_level(iterator, RIL.TEXTLINE):
+                try:
+                    text = line.GetUTF8Text(RIL.TEXTLINE)
+                except RuntimeError:
+                    continue  # Non-text block (image / separator)
+                box = line.BoundingBox(RIL.TEXTLINE)
+                image_idx = max(bisect.bisect_right(offsets, box[1]) - 1, 0) if box else 0
+                lines[image_idx].append(text)
+                confs[image_idx].append(line.Confidence(RIL.TEXTLINE))
+    return [(''.join(l), sum(c) / len(c) if c else 0.0) for l, c in zip(lines, confs)]
+
+# White gap between stacked images so Tesseract never merges lines across them
+BATCH_SEPARATOR_PX = 40
+# Per-canvas limits: Tesseract rejects images taller than 32767px, and a canvas is
+# allocated for every preprocessing variant, so pixels are capped as well
+MAX_CANVAS_HEIGHT = 30000
+MAX_CANVAS_PIXELS = 25_000_000
+
+def _canvas_groups(sizes: List[Tuple[int, int]]) -> List[List[int]]:
+    """
+    Split images (by (h, w) size, in order) into runs that each fit on one canvas.
+    Returns the image indices of each canvas; an image is never split, so one that
+    exceeds a limit on its own still gets a canvas of its own.
+    """
+    groups: List[List[int]] = []
+    current: List[int] = []
+    canvas_h = canvas_w = 0
+    for i, (h, w) in enumerate(sizes):
+        new_h = canvas_h + BATCH_SEPARATOR_PX + h if current else h
+        new_w = max(canvas_w, w)
+        if current and (new_h > MAX_CANVAS_HEIGHT or new_h * new_w > MAX_CANVAS_PIXELS):
+            groups.append(current)
+            current, new_h, new_w = [], h, w
+        current.append(i)
+        canvas_h, canvas_w = new_h, new_w
+    if current:
+        groups.append(current)
+    return groups
+
+def _stack_preprocessed(grays: List[np.ndarray], prep_fn) -> Tuple[np.ndarray, List[int]]:
+    """Preprocess each (resized) image onto one white canvas; returns it and each image's top offset."""
+    if len(grays) == 1:
+        return prep_fn(grays[0]), [0]
+    
+    sizes = [gray.shape for gray in grays]
+    total_h = sum(h for h, _ in sizes) + BATCH_SEPARATOR_PX * (len(sizes) - 1)
+    canvas = np.full((total_h, max(w for _, w in sizes)), 255, dtype=np.uint8)
+    offsets = []
+    y = 0
+    for gray, (h, w) in zip(grays, sizes):
+        # Copied straight in — prep_fn may return a reused scratch buffer
+        canvas[y:y + h, :w] = prep_fn(gray)
+        offsets.append(y)
+        y += h + BATCH_SEPARATOR_PX
+    return canvas, offsets
+
+# Shared by all requests. tesserocr releases the GIL while recognizing, so the
+# passes of one request run in parallel on separate pooled engines.
+_OCR_EXECUTOR = ThreadPoolExecutor(max_workers=OCR_THREADS, thread_name_prefix="ocr")
+
+def extract_text_multi_pass(grays: List[np.ndarray], high_quality: bool = False) -> List[List[str]]:
+    """
+    Run multiple preprocessing + OCR config combinations over a batch of images,
+    already OCR-sized by _resize_for_ocr. Each combination is one Tesseract call
+    per canvas of stacked images (see _canvas_groups); the calls run in parallel.
+    Returns all non-empty results per image, most confident first.
+    """
+    denoise = _denoise_nlm if high_quality else _denoise
     preprocessors = [
-        ("binary", preprocess_binary),
-        ("adaptive", preprocess_adaptive),
+        ("binary", partial(preprocess_binary, denoise=denoise)),
+        ("adaptive", partial(preprocess_adaptive, denoise=denoise)),
         ("sharp", preprocess_sharp),
         ("raw", preprocess_raw),
     ]
     
-    results = []
+    groups = _canvas_groups([gray.shape for gray in grays])
+    
+    # Preprocess on this thread (outputs may live in its scratch buffers), and fan
+    # each variant's page-segmentation passes out to the engine pool as it is ready
+    jobs = []
     for prep_name, prep_fn in preprocessors:
+        canvases = list(groups)
+        while canvases:
+            canvas = canvases.pop()
+            try:
+                processed, offsets = _stack_preprocessed([grays[i] for i in canvas], prep_fn)
+            except Exception as e:
+                logger.warning(f"Preprocessing failed [{prep_name}]: {e}")
+                if len(canvas) > 1:
+                    # Retry image by image, so only the image that failed loses this variant
+                    canvases.extend([i] for i in canvas)
+                continue
+            for psm in OCR_CONFIGS:
+                job = _OCR_EXECUTOR.submit(extract_text_stacked, processed, offsets, psm)
+                jobs.append((prep_name, canvas, job))
+    
+    results = [[] for _ in grays]
+    for prep_name, group, job in jobs:
         try:
-            processed = prep_fn(img)
-            for config in OCR_CONFIGS:
-                try:
-                    text = extract_text_single(processed, config)
-                    if text and text.strip():
-                        results.append(text)
-                except Exception as e:
-                    logger.warning(f"OCR failed [{prep_name}]: {e}")
+            passes = job.result()
         except Exception as e:
-            logger.warning(f"Preprocessing failed [{prep_name}]: {e}")
-    
-    return results
-
-
-# ── Line cleaning ─────────────────────────────────────────────────────────────
-
-def clean_lines(raw_text: str) -> List[str]:
-    """
-    Extract meaningful non-empty lines from OCR text.
-    Merges multi-line values that belong together and strips junk lines.
-    """
-    raw_lines = raw_text.split('\n')
-    cleaned = []
-    for line in raw_lines:
-        # Normalize whitespace
-        stripped = re.sub(r'\s+', ' ', line).strip()
-        # Skip completely empty or single-char junk
-        if not stripped or len(stripped) <= 1:
-            continue
-        # Skip lines that are purely decorative (e.g., dashes, underscores, asterisks)
-        if re.match(r'^[\-_=\*\.\|]+$', stripped):
+            logger.warning(f"OCR failed [{prep_name}]: {e}")
             continue
-        cleaned.append(stripped)
-    return cleaned
-
-
-# ── Core extraction: positional mapping with validation ──────────────────────
-
-def extract_fields_positional(lines: List[str]) -> Tuple[Dict[str, str], float]:
-    """
-    Map cleaned lines to fields by position.
-    Returns (field_dict, total_confidence).
-    """
-    data = {k: None for k in FIELD_ORDER}
-    field_confidences = {}
-    
-    for i, field_name in enumerate(FIELD_ORDER):
-        if i < len(lines):
-            raw_val = lines[i]
-            validator = FIELD_VALIDATORS.get(field_name)
-            if validator:
-                cleaned_val, conf = validator(raw_val)
-                data[field_name] = cleaned_val
-                field_confidences[field_name] = conf
-            else:
-                data[field_name] = raw_val
-                field_confidences[field_name] = 0.5
-        else:
-            field_confidences[field_name] = 0.0
-    
-    # Calculate overall confidence
-    filled = sum(1 for v in data.values() if v)
-    valid_count = sum(1 for c in field_confidences.values() if c >= 0.7)
-    total_confidence = round((valid_count / 16) * 100, 2)
-    
-    return data, total_confidence
+        for i, (text, conf) in zip(group, passes):
+            if text and text.strip():
+                results[i].append((conf, text))
+    
+    # Field extraction keeps the first of equally-scored passes, so order by
+    # Tesseract's confidence to let the best-recognized text win ties
+    for image_results in results:
+        image_results.sort(key=lambda r: r[0], reverse=True)
+    return [[text for _, text in image_results] for image_results in results]
+
+
+# ── Result cache ──────────────────────────────────────────────────────────────
+
+# Parsed results keyed by (BLAKE3 digest of the image bytes, high_quality, stacked) —
+# retries and re-clicks from the extension skip the whole OCR pipeline.
+# `stacked` marks results recognized alongside other images of a batch: Tesseract's
+# page layout analysis then also saw the neighbouring images, so those results are
+# kept apart from single-image ones and /ocr never returns a batch-derived result.
+# Batches reuse either kind.
+# Only touched from the event loop thread, so no locking is needed.
+CacheKey = Tuple[bytes, bool, bool]
+_RESULT_CACHE: TTLCache = TTLCache(maxsize=1024, ttl=3600)
+
+# Cache keys currently being OCR'd — a duplicate submitted before the first one
+# finishes (double-click, client retry) awaits that result instead of redoing it.
+_IN_FLIGHT: Dict[CacheKey, asyncio.Future] = {}
+# Running OCR jobs — held so a job isn't garbage-collected while no request awaits its task
+_OCR_JOBS: Set[asyncio.Task] = set()
+
+def _lookup(table: dict, digest: bytes, high_quality: bool, batch: bool):
+    """Entry for an image in _RESULT_CACHE or _IN_FLIGHT — single-image results first."""
+    for stacked in (False, True) if batch else (False,):
+        entry = table.get((digest, high_quality, stacked))
+        if entry is not None:
+            return entry
+    return None
 
 
-# ── Fallback: pattern-based extraction for misaligned OCR ─────────────────────
-
-def extract_fields_pattern_fallback(lines: List[str], all_text: str) -> Dict[str, Optional[str]]:
-    """
-    If positional mapping fails badly, try to identify fields by their content patterns.
-    This is the safety net for when OCR produces extra/missing lines.
-    """
-    data = {k: None for k in FIELD_ORDER}
-    all_tokens = []
-    for line in lines:
-        all_tokens.extend(line.split())
-    
-    used_values = set()
-    
-    # Email — unique pattern, easiest to find
-    for t in all_tokens:
-        if '@' in t and '.' in t:
-            cleaned, _ = validate_email(t)
-            data['email'] = cleaned
-            used_values.add(t)
-            break
-    
-    # IP — unique dotted-quad pattern
-    for t in all_tokens:
-        if re.match(r'^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$', t):
-            data['ip'] = t
-            used_values.add(t)
-            break
-    
-    # DOB — date pattern
-    for t in all_tokens:
-        if re.match(r'^\d{4}[\-/\.]\d{1,2}[\-/\.]\d{1,2}$', t):
-            cleaned, _ = validate_dob(t)
-            data['dob'] = cleaned
-            used_values.add(t)
-            break
-    
-    # State codes — 2 uppercase letters that are valid US states
-    state_candidates = []
-    for t in all_tokens:
-        if re.match(r'^[A-Z]{2}$', t) and t in VALID_STATES and t not in used_values:
-            state_candidates.append(t)
-    if len(state_candidates) >= 1:
-        data['state'] = state_candidates[0]
-    if len(state_candidates) >= 2:
-        data['licence_state'] = state_candidates[1]
-    
-    # ZIP — 5-digit number
-    for t in all_tokens:
-        if re.match(r'^\d{5}$', t) and t not in used_values:
-            data['zip'] = t
-            used_values.add(t)
-            break
-    
-    # SSN — 9 digits
-    for t in all_tokens:
-        digits = _clean_for_digits(t)
-        if len(digits) == 9 and t not in used_values:
-            data['ssn'] = digits
-            used_values.add(t)
-            break
-    
-    # Phone — 10 digits
-    for t in all_tokens:
-        digits = _clean_for_digits(t)
-        if len(digits) == 10 and digits != data.get('ssn') and t not in used_values:
-            data['phone'] = digits
-            used_values.add(t)
-            break
-    
-    # Account — 8-12 digit number (not phone, not SSN)
-    for t in all_tokens:
-        digits = _clean_for_digits(t)
-        if 8 <= len(digits) <= 12 and digits != data.get('phone') and digits != data.get('ssn') and t not in used_values:
-            data['account_no'] = digits
-            used_values.add(t)
-            break
-    
-    # Bank name — line containing 'bank' (case-insensitive)
-    for line in lines:
-        if 'bank' in line.lower():
-            cleaned = re.sub(r'^[\d\s]+', '', line).strip()
-            cleaned = re.sub(r'\s+\d+.*$', '', cleaned).strip()
-            if cleaned:
-                data['bank_name'] = cleaned
-                break
-    
-    # Address — line starting with a number followed by street words
-    for line in lines:
-        if re.match(r'^\d+\s+\w', line) and 'bank' not in line.lower():
-            data['address'] = line.strip()
-            break
-    
-    # Names — first two all-uppercase words
-    name_tokens = []
-    for t in all_tokens[:6]:
-        if t.isupper() and len(t) > 1 and not t.isdigit() and '@' not in t and t not in VALID_STATES and t not in used_values:
-            name_tokens.append(t)
-            if len(name_tokens) == 2:
-                break
-    if len(name_tokens) >= 1:
-        data['first_name'] = name_tokens[0]
-    if len(name_tokens) >= 2:
-        data['last_name'] = name_tokens[1]
-    
-    # City — uppercase word that's not a state code and not already used
-    for line in lines:
-        cleaned = re.sub(r'[^A-Za-z\s]', '', line).strip()
-        if cleaned and cleaned.isupper() and len(cleaned) > 2 and cleaned not in VALID_STATES:
-            if cleaned != data.get('first_name') and cleaned != data.get('last_name'):
-                data['city'] = cleaned
-                break
-    
-    # Loan amount — remaining short numeric
-    for t in all_tokens:
-        digits = _clean_for_digits(t)
-        if 1 <= len(digits) <= 6 and t not in used_values:
-            if digits != data.get('zip') and digits != data.get('ssn') and digits != data.get('phone') and digits != data.get('account_no'):
-                data['loan_amount'] = digits
-                used_values.add(t)
-                break
-    
-    # Licence — alphanumeric string 8+ chars, not email
-    for t in all_tokens:
-        if re.match(r'^[A-Za-z]\d{5,}', t) and '@' not in t and t not in used_values:
-            data['licence_no'] = t.upper()
-            used_values.add(t)
-            break
-    
-    return data
+# ── API endpoints ─────────────────────────────────────────────────────────────
 
+# Whole-request OCR jobs (decode → multi-pass OCR → field extraction) run here rather
+# than in asyncio's shared default pool. Sized like the engine pool, so at most
+# OCR_THREADS images are in the pipeline while the event loop keeps downloading.
+_REQUEST_EXECUTOR = ThreadPoolExecutor(max_workers=OCR_THREADS, thread_name_prefix="request")
 
-# ── Main extraction orchestrator ──────────────────────────────────────────────
+# Per-image outcome: the extracted fields, or the error for that image alone
+OCRResult = Union[dict, HTTPException]
 
-def extract_fields(raw_texts: List[str]) -> dict:
+def _ocr_uncached(contents: List[bytes], high_quality: bool) -> Tuple[List[OCRResult], bool]:
     """
-    Try all OCR results, pick the one that produces the best extraction.
-    Uses positional mapping as primary strategy, pattern fallback if needed.
+    Blocking pipeline for cache misses — runs on a _REQUEST_EXECUTOR thread.
+    Failures are returned per image rather than raised, so one undecodable or
+    blank image doesn't cost the rest of its batch their results.
+    Also returns whether several images were actually recognized together.
     """
-    best_result = None
-    best_confidence = -1.0
-    best_raw = ""
+    results: List[OCRResult] = [None] * len(contents)
+    grays = []
+    decoded = []
+    for i, content in enumerate(contents):
+        try:
+            # Resize once per image — every variant starts from the same OCR-sized gray
+            grays.append(_resize_for_ocr(decode_gray(content)))
+            decoded.append(i)
+        except HTTPException as e:
+            results[i] = e
+        except Exception as e:
+            logger.error(f"Image preparation failed: {e}", exc_info=True)
+            results[i] = HTTPException(status_code=500, detail=str(e))
     
-    for raw_text in raw_texts:
-        lines = clean_lines(raw_text)
-        logger.info(f"Cleaned lines ({len(lines)}): {lines}")
+    for i, raw_texts in zip(decoded, extract_text_multi_pass(grays, high_quality)):
+        logger.info(f"Got {len(raw_texts)} OCR passes")
         
-        if len(lines) < 5:
-            # Too few lines — probably bad OCR
+        if not raw_texts:
+            results[i] = HTTPException(status_code=500, detail="All OCR passes failed")
             continue
         
-        # ── Strategy 1: Positional mapping (primary) ──
-        if 14 <= len(lines) <= 20:
-            # About the right number of lines — try positional
-            # If we have extra lines, try trimming from the top/bottom
-            candidates = []
-            
-            # Try direct 1:1 mapping
-            candidates.append(lines[:16])
-            
-            # Try skipping first line (sometimes OCR picks up a header)
-            if len(lines) > 16:
-                candidates.append(lines[1:17])
-            
-            # Try skipping first two lines
-            if len(lines) > 17:
-                candidates.append(lines[2:18])
-            
-            for candidate_lines in candidates:
-                data, confidence = extract_fields_positional(candidate_lines)
-                if confidence > best_confidence:
-                    best_confidence = confidence
-                    best_result = data
-                    best_raw = raw_text
-        
-        # ── Strategy 2: Pattern-based fallback ──
-        pattern_data = extract_fields_pattern_fallback(lines, raw_text)
-        pattern_filled = sum(1 for v in pattern_data.values() if v)
-        pattern_confidence = round((pattern_filled / 16) * 100, 2)
+        # Log first pass for debugging
+        logger.info(f"Pass 1 raw text:\n{raw_texts[0]}")
         
-        if pattern_confidence > best_confidence:
-            best_confidence = pattern_confidence
-            best_result = pattern_data
-            best_raw = raw_text
-    
-    # If no result from multi-pass, try the first raw text as last resort
-    if best_result is None and raw_texts:
-        lines = clean_lines(raw_texts[0])
-        best_result, best_confidence = extract_fields_positional(lines)
-        best_raw = raw_texts[0]
-    
-    if best_result is None:
-        best_result = {k: None for k in FIELD_ORDER}
-        best_confidence = 0.0
-        best_raw = ""
-    
-    best_result['confidence'] = best_confidence
-    best_result['raw_text'] = best_raw
-    
-    logger.info(f"Best confidence: {best_confidence}%")
-    logger.info(f"Result: {best_result}")
-    return best_result
-
+        try:
+            results[i] = extract_fields(raw_texts)
+        except Exception as e:
+            logger.error(f"Field extraction failed: {e}", exc_info=True)
+            results[i] = HTTPException(status_code=500, detail=str(e))
+    return results, len(grays) > 1
 
-# ── API endpoints ─────────────────────────────────────────────────────────────
+async def _run_ocr_job(todo: Dict[CacheKey, bytes], high_quality: bool) -> None:
+    """
+    OCR the images in `todo` and resolve each one's _IN_FLIGHT future with that
+    image's own result or error. Runs as a task of its own, so cancelling the request
+    that started it (client disconnect) doesn't cancel work other requests await.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        fresh, stacked = await loop.run_in_executor(
+            _REQUEST_EXECUTOR, _ocr_uncached, list(todo.values()), high_quality
+        )
+    except asyncio.CancelledError:
+        # Only on shutdown — nothing will resolve these any more
+        for key in todo:
+            _IN_FLIGHT.pop(key).cancel()
+        raise
+    except Exception as e:
+        # Per-image failures come back as values; this is an unexpected pipeline error
+        logger.error(f"OCR job failed: {e}", exc_info=True)
+        fresh, stacked = [HTTPException(status_code=500, detail=str(e)) for _ in todo], False
+    
+    for key, result in zip(todo, fresh):
+        if isinstance(result, dict):   # errors are not cached — a retry may succeed
+            # Cached by how the image was really recognized: alone if its neighbours failed to decode
+            digest, _, _ = key
+            _RESULT_CACHE[(digest, high_quality, stacked)] = result
+        _IN_FLIGHT.pop(key).set_result(result)
+
+async def ocr_images(contents: List[bytes], high_quality: bool = False) -> List[OCRResult]:
+    """
+    Cache-aware OCR + field extraction for a batch of downloaded images.
+    Returns each image's fields, or an HTTPException (not raised) for images that failed.
+    """
+    digests = [blake3(content).digest() for content in contents]
+    batch = len(set(digests)) > 1
+    results = [_lookup(_RESULT_CACHE, digest, high_quality, batch) for digest in digests]
+    misses = [i for i, result in enumerate(results) if result is None]
+    if len(misses) < len(contents):
+        logger.info(f"Cache hit for {len(contents) - len(misses)}/{len(contents)} images")
+    if not misses:
+        return results
+    
+    loop = asyncio.get_running_loop()
+    pending: Dict[bytes, asyncio.Future] = {}
+    todo: Dict[bytes, bytes] = {}   # deduplicated images this call OCRs itself, by digest
+    for i in misses:
+        digest = digests[i]
+        if digest in pending:
+            continue
+        shared = _lookup(_IN_FLIGHT, digest, high_quality, batch)
+        if shared is not None:
+            pending[digest] = shared
+        else:
+            todo[digest] = contents[i]
+    
+    if todo:
+        # Only the images recognized here share a canvas — not cache hits or shared work
+        stacked = len(todo) > 1
+        keyed: Dict[CacheKey, bytes] = {}
+        for digest, content in todo.items():
+            key = (digest, high_quality, stacked)
+            pending[digest] = _IN_FLIGHT[key] = loop.create_future()
+            keyed[key] = content
+        job = asyncio.ensure_future(_run_ocr_job(keyed, high_quality))
+        _OCR_JOBS.add(job)
+        job.add_done_callback(_OCR_JOBS.discard)
+    else:
+        logger.info(f"Waiting on {len(pending)} images already being processed")
+    
+    for i in misses:
+        # shield: a cancelled waiter must not cancel the future other requests share
+        results[i] = await asyncio.shield(pending[digests[i]])
+    return results
 
 @app.post("/ocr", response_model=OCRResponse)
 async def process_ocr(req: OCRRequest):
     try:
-        img = download_image(req.image_url)
-        
-        # Multi-pass OCR
-        raw_texts = extract_text_multi_pass(img)
-        logger.info(f"Got {len(raw_texts)} OCR passes")
-        
-        if not raw_texts:
-            raise HTTPException(status_code=500, detail="All OCR passes failed")
-        
-        # Log first pass for debugging
-        logger.info(f"Pass 1 raw text:\n{raw_texts[0]}")
-        
-        result = extract_fields(raw_texts)
-        return OCRResponse(**result)
+        content = await download_image(req.image_url)
+        [result] = await ocr_images([content], req.high_quality)
+        if isinstance(result, HTTPException):
+            raise HTTPException(status_code=result.status_code, detail=result.detail)
+        # Values come from our own extraction; FastAPI validates the response model on the way out
+        return OCRResponse.model_construct(**result)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _batch_entry(result: Union[OCRResult, BaseException]) -> OCRResponse:
+    """One /ocr/batch response item — the fields, or just the error for that image."""
+    if isinstance(result, dict):
+        return OCRResponse.model_construct(**result)
+    if not isinstance(result, HTTPException):
+        logger.error(f"Error: {result}", exc_info=result)
+    return OCRResponse(error=str(getattr(result, 'detail', result)))
+
+@app.post("/ocr/batch", response_model=List[OCRResponse])
+async def process_ocr_batch(req: OCRBatchRequest):
+    try:
+        # Each image succeeds or fails on its own: a bad URL or image yields an
+        # entry with `error` set, and the rest of the batch is still recognized
+        results = await asyncio.gather(
+            *(download_image(url) for url in req.image_urls), return_exceptions=True
+        )
+        downloaded = [i for i, content in enumerate(results) if isinstance(content, bytes)]
+        recognized = await ocr_images([results[i] for i in downloaded], req.high_quality)
+        for i, result in zip(downloaded, recognized):
+            results[i] = result
+        return [_batch_entry(result) for result in results]
     except HTTPException:
         raise
     except Exception as e:
@@ -778,4 +600,7 @@ async def health():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Multiple workers need an import string (each worker process imports main itself);
+    # a single worker serves the app already loaded here instead of importing it again
+    target = "main:app" if WEB_CONCURRENCY > 1 else app
+    uvicorn.run(target, host="0.0.0.0", port=8000, workers=WEB_CONCURRENCY)
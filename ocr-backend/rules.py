@@ -0,0 +1,674 @@
+"""
+OCR AutoFill — field extraction rules: line cleaning, per-field validators,
+positional mapping and the pattern-based fallback.
+"""
+
+import re
+import string
+import itertools
+import logging
+from typing import Optional, List, Dict, Tuple, cast
+
+logger = logging.getLogger(__name__)
+
+# ── Fixed field order (matches the document's line layout) ────────────────────
+
+FIELD_ORDER = [
+    'first_name',      # Line 1
+    'last_name',       # Line 2
+    'email',           # Line 3
+    'ssn',             # Line 4
+    'phone',           # Line 5
+    'bank_name',       # Line 6
+    'account_no',      # Line 7
+    'loan_amount',     # Line 8
+    'address',         # Line 9
+    'city',            # Line 10
+    'state',           # Line 11
+    'zip',             # Line 12
+    'dob',             # Line 13
+    'licence_no',      # Line 14
+    'licence_state',   # Line 15
+    'ip',              # Line 16
+]
+
+# All-None result template; .copy() is a C-level dict copy, cheaper than rebuilding it
+_EMPTY_FIELDS = dict.fromkeys(FIELD_ORDER)
+
+# ── Valid US state codes ──────────────────────────────────────────────────────
+
+VALID_STATES = frozenset({
+    'AL','AK','AZ','AR','CA','CO','CT','DE','FL','GA','HI','ID','IL','IN','IA',
+    'KS','KY','LA','ME','MD','MA','MI','MN','MS','MO','MT','NE','NV','NH','NJ',
+    'NM','NY','NC','ND','OH','OK','OR','PA','RI','SC','SD','TN','TX','UT','VT',
+    'VA','WA','WV','WI','WY','DC','PR','VI','GU','AS','MP',
+})
+
+# ── Common OCR character confusions ──────────────────────────────────────────
+
+OCR_DIGIT_FIXES = str.maketrans({'O': '0', 'o': '0', 'I': '1', 'l': '1',
+                                  'S': '5', 's': '5', 'B': '8', 'b': '8',
+                                  'Z': '2', 'z': '2', 'G': '6', 'g': '9',
+                                  'T': '7', 'D': '0', 'Q': '0', 'A': '4'})
+
+OCR_ALPHA_FIXES = str.maketrans({'0': 'O', '1': 'I', '5': 'S', '8': 'B',
+                                  '2': 'Z', '6': 'G', '9': 'g', '7': 'T',
+                                  '4': 'A', '3': 'E'})
+
+
+class _KeepOnly(dict):
+    """str.translate table that deletes every character it has no mapping for."""
+    def __missing__(self, key: int) -> None:
+        return None
+
+# Fix + filter in a single translate pass: OCR look-alikes map to digits,
+# digits map to themselves, everything else is dropped.
+_DIGITS_ONLY = _KeepOnly(OCR_DIGIT_FIXES)
+_DIGITS_ONLY.update({ord(d): d for d in '0123456789'})
+
+# Same for the alpha cleaner: digit look-alikes map to letters, letters and
+# spaces map to themselves.
+_ALPHA_ONLY = _KeepOnly(OCR_ALPHA_FIXES)
+_ALPHA_ONLY.update({ord(c): c for c in string.ascii_letters + ' '})
+
+
+# ── Per-field validators & cleaners ──────────────────────────────────────────
+
+# Compiled once here rather than looked up in re's pattern cache on every call
+_RE_NON_NAME = re.compile(r'[^A-Za-z\s\'-]')
+_RE_EMAIL = re.compile(r'[a-zA-Z0-9._%+\-]+@[a-zA-Z0-9.\-]+\.[a-zA-Z]{2,}')
+_RE_NON_BANK = re.compile(r'[^A-Za-z0-9\s\.\&\'-]')
+_RE_NON_WORD = re.compile(r'[^A-Za-z0-9\s]')
+_RE_DIGIT_RUN = re.compile(r'[\d]+')
+_RE_STREET_NUMBER = re.compile(r'^\d+\s+')
+_RE_NON_CITY = re.compile(r'[^A-Za-z\s\.\-]')
+_RE_DIGIT = re.compile(r'\d')
+_RE_NON_UPPER = re.compile(r'[^A-Z]')
+_RE_DATE_YMD = re.compile(r'^(\d{4})[/\-\.](\d{1,2})[/\-\.](\d{1,2})$')
+_RE_DATE_MDY = re.compile(r'^(\d{1,2})[/\-\.](\d{1,2})[/\-\.](\d{4})$')
+_RE_SPACE_DASH = re.compile(r'[\s\-]')
+_RE_IPV4 = re.compile(r'^(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})$')
+_RE_IPV4_ANYWHERE = re.compile(r'(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})')
+_RE_NON_IP = re.compile(r'[^0-9\.]')
+
+def _clean_for_digits(s: str) -> str:
+    """Remove all non-digit characters, fixing common OCR alpha→digit errors."""
+    return s.translate(_DIGITS_ONLY)
+
+def _clean_for_alpha(s: str) -> str:
+    """Remove non-alpha characters, fixing common OCR digit→alpha errors."""
+    return s.translate(_ALPHA_ONLY).strip()
+
+def validate_first_name(val: str) -> Tuple[str, float]:
+    cleaned = _RE_NON_NAME.sub('', val).strip()
+    if cleaned and len(cleaned) >= 1:
+        return cleaned.upper(), 1.0
+    alpha = _clean_for_alpha(val)
+    if alpha:
+        return alpha.upper(), 0.7
+    return val.strip().upper(), 0.3
+
+def validate_last_name(val: str) -> Tuple[str, float]:
+    return validate_first_name(val)  # Same logic
+
+def validate_email(val: str) -> Tuple[str, float]:
+    # Fix common OCR errors in email
+    cleaned = val.strip().lower()
+    cleaned = cleaned.replace(' ', '')
+    cleaned = cleaned.replace(',', '.')
+    cleaned = cleaned.replace('(a)', '@').replace('[at]', '@')
+    cleaned = cleaned.replace('@@', '@')
+    # Fix common OCR: 'rn' misread as 'm', etc.
+    if '@' in cleaned and '.' in cleaned:
+        return cleaned, 1.0
+    # Try to find email pattern in a messy string
+    m = _RE_EMAIL.search(cleaned)
+    if m:
+        return m.group(0), 0.9
+    return cleaned, 0.3
+
+def validate_ssn(val: str) -> Tuple[str, float]:
+    digits = _clean_for_digits(val)
+    if len(digits) == 9:
+        return digits, 1.0
+    # If we got close (8 or 10 digits), try to fix
+    if len(digits) == 10:
+        return digits[:9], 0.7
+    if len(digits) == 8:
+        return digits, 0.5
+    return digits if digits else val.strip(), 0.3
+
+def validate_phone(val: str) -> Tuple[str, float]:
+    digits = _clean_for_digits(val)
+    # Remove country code prefix
+    if len(digits) == 11 and digits[0] == '1':
+        digits = digits[1:]
+    if len(digits) == 10:
+        return digits, 1.0
+    if len(digits) == 9:
+        return digits, 0.6
+    return digits if digits else val.strip(), 0.3
+
+def validate_bank_name(val: str) -> Tuple[str, float]:
+    # Allow digits (e.g., "Citizens 1st Bank", "First 2nd Bank")
+    cleaned = _RE_NON_BANK.sub('', val).strip()
+    if cleaned and len(cleaned) >= 3:
+        return cleaned, 1.0
+    # Fallback: keep anything that looks like words
+    words = _RE_NON_WORD.sub('', val).strip()
+    if words and len(words) >= 3:
+        return words, 0.7
+    return val.strip(), 0.3
+
+def validate_account_no(val: str) -> Tuple[str, float]:
+    digits = _clean_for_digits(val)
+    if 6 <= len(digits) <= 17:
+        return digits, 1.0
+    return digits if digits else val.strip(), 0.3
+
+def validate_loan_amount(val: str) -> Tuple[str, float]:
+    # Remove $ sign and commas
+    cleaned = val.replace('$', '').replace(',', '').strip()
+    digits = _clean_for_digits(cleaned)
+    if digits and 1 <= len(digits) <= 10:
+        return digits, 1.0
+    # Try extracting just the number
+    m = _RE_DIGIT_RUN.search(cleaned)
+    if m:
+        return m.group(0), 0.8
+    return val.strip(), 0.3
+
+# Common street suffixes and their OCR-corrupted versions
+STREET_SUFFIX_FIXES = {
+    '5T': 'ST', '5t': 'ST', '$T': 'ST', 'S7': 'ST',
+    '4VE': 'AVE', '4ve': 'AVE', 'AV3': 'AVE', 'AVF': 'AVE',
+    '8LVD': 'BLVD', 'BLVO': 'BLVD', 'B1VD': 'BLVD',
+    'DR1VE': 'DRIVE', 'DR1': 'DR',
+    'LM': 'LN', '1N': 'LN',
+    'C7': 'CT', 'C1': 'CT',
+    'P1': 'PL', 'PK': 'PL',
+    'RO': 'RD', 'R0': 'RD',
+    'WAV': 'WAY', 'W4Y': 'WAY',
+}
+
+def _fix_address_ocr(addr: str) -> str:
+    """Fix common OCR errors in address street suffixes and directions."""
+    # Fix street suffixes (usually last word or near-last)
+    return ' '.join([STREET_SUFFIX_FIXES.get(part.upper(), part) for part in addr.split()])
+
+def validate_address(val: str) -> Tuple[str, float]:
+    cleaned = val.strip()
+    if not cleaned:
+        return val.strip(), 0.3
+    # Fix OCR errors in street suffixes
+    cleaned = _fix_address_ocr(cleaned)
+    # Address should start with a number
+    if _RE_STREET_NUMBER.match(cleaned):
+        return cleaned, 1.0
+    # Try to fix leading digit OCR errors (e.g., 'l121' -> '1121')
+    parts = cleaned.split()
+    fixed = _clean_for_digits(parts[0]) + ' ' + ' '.join(parts[1:]) if parts else cleaned
+    if _RE_STREET_NUMBER.match(fixed):
+        return fixed, 0.8
+    return cleaned, 0.5
+
+def validate_city(val: str) -> Tuple[str, float]:
+    # Cities are purely alphabetic — fix any OCR digit-to-alpha confusions
+    cleaned = val.strip()
+    
+    # If no digits, it's clean
+    pure_alpha = _RE_NON_CITY.sub('', cleaned).strip()
+    if pure_alpha and len(pure_alpha) >= 2 and not _RE_DIGIT.search(cleaned):
+        return pure_alpha.upper(), 1.0
+    
+    # Has digits — likely OCR errors; convert digits to closest letters
+    fixed = cleaned.translate(OCR_ALPHA_FIXES)
+    fixed = _RE_NON_CITY.sub('', fixed).strip()
+    if fixed and len(fixed) >= 2:
+        return fixed.upper(), 0.8
+    
+    # Last resort: just strip non-alpha
+    alpha = _clean_for_alpha(cleaned)
+    if alpha:
+        return alpha.upper(), 0.7
+    return val.strip().upper(), 0.3
+
+def _nearest_state(pair: str) -> Optional[str]:
+    """First valid state reached by changing one letter (first letter tried first, A→Z)."""
+    for i in range(2):
+        for c in string.ascii_uppercase:
+            candidate = pair[:i] + c + pair[i+1:]
+            if candidate in VALID_STATES:
+                return candidate
+    return None
+
+# Corrections for invalid 2-letter codes one substitution away from a state code.
+# Valid codes are left out: validate_state only consults this after the code has
+# failed the VALID_STATES checks.
+_STATE_NEIGHBORS = {
+    pair: state
+    for pair in map(''.join, itertools.product(string.ascii_uppercase, repeat=2))
+    if pair not in VALID_STATES and (state := _nearest_state(pair)) is not None
+}
+
+def validate_state(val: str) -> Tuple[str, float]:
+    cleaned = val.strip().upper()
+    
+    # Direct match (perfect case)
+    pure = _RE_NON_UPPER.sub('', cleaned)
+    if pure in VALID_STATES:
+        return pure, 1.0
+    
+    # First 2 alpha chars
+    if len(pure) >= 2 and pure[:2] in VALID_STATES:
+        return pure[:2], 0.9
+    
+    # Fix OCR digit→alpha errors (e.g., '4Z' → 'AZ', 'M0' → 'MO')
+    fixed = cleaned.translate(OCR_ALPHA_FIXES)
+    fixed_pure = _RE_NON_UPPER.sub('', fixed.upper())
+    if fixed_pure in VALID_STATES:
+        return fixed_pure, 0.8
+    if len(fixed_pure) >= 2 and fixed_pure[:2] in VALID_STATES:
+        return fixed_pure[:2], 0.75
+    
+    # Fuzzy: closest state one substitution away from the first 2 letters
+    if pure[:2] in _STATE_NEIGHBORS:
+        return _STATE_NEIGHBORS[pure[:2]], 0.6
+    
+    return pure if pure else val.strip().upper(), 0.3
+
+def validate_zip(val: str) -> Tuple[str, float]:
+    digits = _clean_for_digits(val)
+    if len(digits) >= 5:
+        return digits[:5], 1.0
+    if len(digits) == 4:
+        return digits, 0.6
+    return digits if digits else val.strip(), 0.3
+
+def validate_dob(val: str) -> Tuple[str, float]:
+    cleaned = val.strip()
+    # Check YYYY-MM-DD
+    m = _RE_DATE_YMD.match(cleaned)
+    if m:
+        return f"{m.group(1)}-{m.group(2).zfill(2)}-{m.group(3).zfill(2)}", 1.0
+    # Check MM/DD/YYYY or DD/MM/YYYY
+    m = _RE_DATE_MDY.match(cleaned)
+    if m:
+        return f"{m.group(3)}-{m.group(1).zfill(2)}-{m.group(2).zfill(2)}", 0.9
+    # Try to extract date-like pattern from messy text
+    digits = _clean_for_digits(cleaned)
+    if len(digits) == 8:
+        # Could be YYYYMMDD or MMDDYYYY
+        if digits[:2] in ('19', '20'):
+            return f"{digits[:4]}-{digits[4:6]}-{digits[6:]}", 0.8
+        else:
+            return f"{digits[4:]}-{digits[:2]}-{digits[2:4]}", 0.7
+    return cleaned, 0.3
+
+# Map of OCR digit→letter fixes specifically for licence number leading char
+LICENCE_FIRST_CHAR_FIXES = {
+    '0': 'O', '1': 'I', '2': 'Z', '3': 'E', '4': 'A',
+    '5': 'S', '6': 'G', '7': 'T', '8': 'B', '9': 'P',
+}
+
+def validate_licence_no(val: str) -> Tuple[str, float]:
+    """Licence numbers are alphanumeric; usually start with a letter."""
+    cleaned = _RE_SPACE_DASH.sub('', val).strip()
+    
+    if not cleaned:
+        return val.strip().upper(), 0.3
+    
+    result = cleaned.upper()
+    conf = 1.0
+    
+    # Most US licence numbers start with a letter. If OCR turned it into a digit,
+    # try to recover — but ONLY for longer values (7+ chars) where we expect
+    # a letter prefix. Short values like "92" should be kept as-is.
+    if result and result[0].isdigit() and len(result) >= 7:
+        # Check if the rest is all digits — then the first char was likely a letter
+        if result[1:].replace(' ', '').isdigit():
+            fixed_char = LICENCE_FIRST_CHAR_FIXES.get(result[0], result[0])
+            result = fixed_char + result[1:]
+            conf = 0.7
+    
+    # Accept any length — licence numbers vary widely by state
+    if len(result) >= 1:
+        return result, conf
+    return result, 0.5
+
+def validate_licence_state(val: str) -> Tuple[str, float]:
+    return validate_state(val)  # Same validation as state
+
+def validate_ip(val: str) -> Tuple[str, float]:
+    cleaned = val.strip()
+    # Standard IPv4 match
+    m = _RE_IPV4.match(cleaned)
+    if m:
+        return m.group(1), 1.0
+    # Try to fix OCR errors in IP (e.g., spaces instead of dots)
+    # Replace common OCR confusions
+    fixed = cleaned.replace(' ', '.').replace(',', '.').replace('..', '.')
+    fixed = _RE_NON_IP.sub('', fixed)
+    m = _RE_IPV4.match(fixed)
+    if m:
+        return m.group(1), 0.8
+    # Try extracting from broader text
+    m = _RE_IPV4_ANYWHERE.search(fixed)
+    if m:
+        return m.group(1), 0.7
+    return cleaned, 0.3
+
+# Map field names to validators
+FIELD_VALIDATORS = {
+    'first_name': validate_first_name,
+    'last_name': validate_last_name,
+    'email': validate_email,
+    'ssn': validate_ssn,
+    'phone': validate_phone,
+    'bank_name': validate_bank_name,
+    'account_no': validate_account_no,
+    'loan_amount': validate_loan_amount,
+    'address': validate_address,
+    'city': validate_city,
+    'state': validate_state,
+    'zip': validate_zip,
+    'dob': validate_dob,
+    'licence_no': validate_licence_no,
+    'licence_state': validate_licence_state,
+    'ip': validate_ip,
+}
+
+# Validators in FIELD_ORDER, so positional mapping can index by line number
+_VALIDATORS_BY_INDEX = tuple(FIELD_VALIDATORS[k] for k in FIELD_ORDER)
+
+
+# ── Line cleaning ─────────────────────────────────────────────────────────────
+
+def clean_lines(raw_text: str) -> List[str]:
+    """
+    Extract meaningful non-empty lines from OCR text.
+    Merges multi-line values that belong together and strips junk lines.
+    """
+    raw_lines = raw_text.split('\n')
+    cleaned = []
+    for line in raw_lines:
+        # Normalize whitespace (split/join collapses runs and trims the ends)
+        stripped = ' '.join(line.split())
+        # Skip completely empty or single-char junk
+        if not stripped or len(stripped) <= 1:
+            continue
+        # Skip lines that are purely decorative (e.g., dashes, underscores, asterisks)
+        if not stripped.strip('-_=*.|'):
+            continue
+        cleaned.append(stripped)
+    return cleaned
+
+
+# ── Core extraction: positional mapping with validation ──────────────────────
+
+def extract_fields_positional(
+    lines: List[str],
+    memo: Optional[Dict[Tuple[int, str], Tuple[str, float]]] = None,
+) -> Tuple[Dict[str, Optional[str]], float]:
+    """
+    Map cleaned lines to fields by position.
+    Returns (field_dict, total_confidence).
+    `memo` caches validator results by (field index, line) across calls.
+    """
+    data = _EMPTY_FIELDS.copy()
+    valid_count = 0
+    if memo is None:
+        memo = {}
+    
+    # Fields past the end of `lines` stay None and count as 0 confidence
+    for i, raw_val in enumerate(lines[:16]):
+        key = (i, raw_val)
+        if key in memo:
+            cleaned_val, conf = memo[key]
+        else:
+            cleaned_val, conf = memo[key] = _VALIDATORS_BY_INDEX[i](raw_val)
+        data[FIELD_ORDER[i]] = cleaned_val
+        if conf >= 0.7:
+            valid_count += 1
+    
+    # Calculate overall confidence
+    total_confidence = round((valid_count / 16) * 100, 2)
+    
+    return data, total_confidence
+
+
+# ── Fallback: pattern-based extraction for misaligned OCR ─────────────────────
+
+# One scan over the whole text classifies every whitespace-delimited token whose
+# shape identifies a field. The branches are mutually exclusive, so m.lastgroup
+# names the field directly and only the matches ever reach Python.
+_RE_TOKEN_SCAN = re.compile(
+    r'(?<!\S)(?:'
+    r'(?P<email>(?=\S*\.)[^\s@]*@\S*)'
+    r'|(?P<state>[A-Z]{2})'
+    r'|(?P<ip>\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'
+    r'|(?P<dob>\d{4}[\-/\.]\d{1,2}[\-/\.]\d{1,2})'
+    r'|(?P<zip>\d{5})'
+    r'|(?P<licence>[A-Za-z]\d{5,}[^\s@]*)'
+    r')(?!\S)'
+)
+_RE_ADDRESS_LINE = re.compile(r'^\d+\s+\w')
+_RE_LEADING_NUMBER = re.compile(r'^[\d\s]+')
+_RE_TRAILING_NUMBER = re.compile(r'\s+\d+.*$')
+_RE_NON_ALPHA_SPACE = re.compile(r'[^A-Za-z\s]')
+
+def extract_fields_pattern_fallback(lines: List[str], all_text: str) -> Dict[str, Optional[str]]:
+    """
+    If positional mapping fails badly, try to identify fields by their content patterns.
+    This is the safety net for when OCR produces extra/missing lines.
+    """
+    data = _EMPTY_FIELDS.copy()
+    # clean_lines output is single-spaced with no empty lines, so one join + split(' ')
+    # yields exactly the per-line tokens. all_text isn't used here: it still holds
+    # the junk lines clean_lines dropped.
+    joined = ' '.join(lines)
+    all_tokens = joined.split(' ') if joined else []
+    
+    used_values = set()
+    
+    # Single classification scan — bucket tokens by the field their shape identifies
+    matches: Dict[str, List[str]] = {'email': [], 'state': [], 'ip': [], 'dob': [], 'zip': [], 'licence': []}
+    for m in _RE_TOKEN_SCAN.finditer(joined):
+        matches[cast(str, m.lastgroup)].append(m.group())
+    state_candidates = [t for t in matches['state'] if t in VALID_STATES]
+    
+    # Email — unique pattern, easiest to find
+    if matches['email']:
+        data['email'], _ = validate_email(matches['email'][0])
+        used_values.add(matches['email'][0])
+    
+    # IP — unique dotted-quad pattern
+    if matches['ip']:
+        data['ip'] = matches['ip'][0]
+        used_values.add(matches['ip'][0])
+    
+    # DOB — date pattern
+    if matches['dob']:
+        data['dob'], _ = validate_dob(matches['dob'][0])
+        used_values.add(matches['dob'][0])
+    
+    # State codes — valid US state abbreviations
+    if len(state_candidates) >= 1:
+        data['state'] = state_candidates[0]
+    if len(state_candidates) >= 2:
+        data['licence_state'] = state_candidates[1]
+    
+    # ZIP — 5-digit number
+    if matches['zip']:
+        data['zip'] = matches['zip'][0]
+        used_values.add(matches['zip'][0])
+    
+    # Numeric fields — one pass, each token's digits cleaned once.
+    # SSN and phone claim the first 9/10-digit tokens, so by the time a later
+    # token is considered for account/loan, the values it must differ from are set.
+    loan_token = None
+    for t in all_tokens:
+        if t in used_values:
+            continue
+        digits = _clean_for_digits(t)
+        n = len(digits)
+        # SSN — 9 digits
+        if n == 9 and data['ssn'] is None:
+            data['ssn'] = digits
+            used_values.add(t)
+        # Phone — 10 digits
+        elif n == 10 and data['phone'] is None:
+            data['phone'] = digits
+            used_values.add(t)
+        # Account — 8-12 digit number (not phone, not SSN)
+        elif 8 <= n <= 12:
+            if data['account_no'] is None and digits != data['phone'] and digits != data['ssn']:
+                data['account_no'] = digits
+                used_values.add(t)
+        # Loan amount — remaining short numeric (not the ZIP)
+        elif 1 <= n <= 6 and loan_token is None and digits != data['zip']:
+            data['loan_amount'] = digits
+            loan_token = t
+    
+    # Lowercase each line once; both the bank and address scans key off 'bank'
+    bank_flags = ['bank' in line.lower() for line in lines]
+    
+    # Bank name — line containing 'bank' (case-insensitive)
+    for line, is_bank in zip(lines, bank_flags):
+        if is_bank:
+            cleaned = _RE_LEADING_NUMBER.sub('', line).strip()
+            cleaned = _RE_TRAILING_NUMBER.sub('', cleaned).strip()
+            if cleaned:
+                data['bank_name'] = cleaned
+                break
+    
+    # Address — line starting with a number followed by street words
+    for line, is_bank in zip(lines, bank_flags):
+        if not is_bank and _RE_ADDRESS_LINE.match(line):
+            data['address'] = line.strip()
+            break
+    
+    # Names — first two all-uppercase words
+    name_tokens = []
+    for t in all_tokens[:6]:
+        # isupper() already rules out all-digit tokens (it needs a cased character)
+        if len(t) > 1 and t.isupper() and '@' not in t and t not in VALID_STATES and t not in used_values:
+            name_tokens.append(t)
+            if len(name_tokens) == 2:
+                break
+    if len(name_tokens) >= 1:
+        data['first_name'] = name_tokens[0]
+    if len(name_tokens) >= 2:
+        data['last_name'] = name_tokens[1]
+    
+    # City — uppercase word that's not a state code and not already used
+    for line in lines:
+        cleaned = _RE_NON_ALPHA_SPACE.sub('', line).strip()
+        if cleaned and cleaned.isupper() and len(cleaned) > 2 and cleaned not in VALID_STATES:
+            if cleaned != data.get('first_name') and cleaned != data.get('last_name'):
+                data['city'] = cleaned
+                break
+    
+    # The loan token only blocks reuse from here on (the name scan may still claim it)
+    if loan_token is not None:
+        used_values.add(loan_token)
+    
+    # Licence — alphanumeric string 8+ chars, not email
+    for t in matches['licence']:
+        if t not in used_values:
+            data['licence_no'] = t.upper()
+            used_values.add(t)
+            break
+    
+    return data
+
+
+# ── Main extraction orchestrator ──────────────────────────────────────────────
+
+# Stop trying further OCR passes once a result is this good (percent of fields valid).
+# Scores move in steps of one field in 16 (6.25), so this only stops on a perfect pass.
+GOOD_ENOUGH_CONFIDENCE = 100.0
+
+def extract_fields(raw_texts: List[str]) -> dict:
+    """
+    Try all OCR results, pick the one that produces the best extraction.
+    Uses positional mapping as primary strategy, pattern fallback if needed.
+    """
+    best_result: Optional[dict] = None
+    best_confidence = -1.0
+    best_raw = ""
+    # OCR passes mostly agree line-for-line, so the same (field, line) pair is
+    # validated many times across passes — do each one once
+    validated: Dict[Tuple[int, str], Tuple[str, float]] = {}
+    seen_texts = set()
+    
+    for raw_text in raw_texts:
+        # An identical pass can't beat the earlier copy's score (ties keep the first)
+        if raw_text in seen_texts:
+            continue
+        seen_texts.add(raw_text)
+        lines = clean_lines(raw_text)
+        logger.info(f"Cleaned lines ({len(lines)}): {lines}")
+        
+        if len(lines) < 5:
+            # Too few lines — probably bad OCR
+            continue
+        
+        # ── Strategy 1: Positional mapping (primary) ──
+        if 14 <= len(lines) <= 20:
+            # About the right number of lines — try positional
+            # If we have extra lines, try trimming from the top/bottom
+            candidates = []
+            
+            # Try direct 1:1 mapping
+            candidates.append(lines[:16])
+            
+            # Try skipping first line (sometimes OCR picks up a header)
+            if len(lines) > 16:
+                candidates.append(lines[1:17])
+            
+            # Try skipping first two lines
+            if len(lines) > 17:
+                candidates.append(lines[2:18])
+            
+            for candidate_lines in candidates:
+                data, confidence = extract_fields_positional(candidate_lines, validated)
+                if confidence > best_confidence:
+                    best_confidence = confidence
+                    best_result = data
+                    best_raw = raw_text
+                    if best_confidence >= GOOD_ENOUGH_CONFIDENCE:
+                        break
+            
+            if best_confidence >= GOOD_ENOUGH_CONFIDENCE:
+                break
+        
+        # ── Strategy 2: Pattern-based fallback ──
+        pattern_data = extract_fields_pattern_fallback(lines, raw_text)
+        pattern_filled = sum(1 for v in pattern_data.values() if v)
+        pattern_confidence = round((pattern_filled / 16) * 100, 2)
+        
+        if pattern_confidence > best_confidence:
+            best_confidence = pattern_confidence
+            best_result = pattern_data
+            best_raw = raw_text
+            if best_confidence >= GOOD_ENOUGH_CONFIDENCE:
+                break
+    
+    # If no result from multi-pass, try the first raw text as last resort
+    if best_result is None and raw_texts:
+        lines = clean_lines(raw_texts[0])
+        best_result, best_confidence = extract_fields_positional(lines)
+        best_raw = raw_texts[0]
+    
+    if best_result is None:
+        best_result = _EMPTY_FIELDS.copy()
+        best_confidence = 0.0
+        best_raw = ""
+    
+    best_result['confidence'] = best_confidence
+    best_result['raw_text'] = best_raw
+    
+    logger.info(f"Best confidence: {best_confidence}%")
+    logger.info(f"Result: {best_result}")
+    return best_result
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# main.py and rules.py are top-level modules of ocr-backend/, not a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
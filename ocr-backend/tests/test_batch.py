@@ -0,0 +1,241 @@
+"""
+Batch recognition: canvas grouping and stacking, splitting Tesseract's line
+results back to their images, and /ocr/batch limits and per-image errors.
+The Tesseract engine is stubbed.
+"""
+
+from contextlib import contextmanager
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import main
+
+
+# ── Splitting recognized lines back to images ─────────────────────────────────
+
+class StubLine:
+    def __init__(self, top, text, conf):
+        self.top, self.text, self.conf = top, text, conf
+
+    def GetUTF8Text(self, level):
+        if self.text is None:
+            raise RuntimeError("not a text block")
+        return self.text
+
+    def BoundingBox(self, level):
+        return (0, self.top, 100, self.top + 20)
+
+    def Confidence(self, level):
+        return self.conf
+
+
+class StubApi:
+    def __init__(self, lines):
+        self.lines = lines
+        self.calls = []
+
+    def SetPageSegMode(self, psm):
+        self.calls.append(("psm", psm))
+
+    def SetImageBytes(self, data, w, h, bpp, bpl):
+        self.calls.append(("image", w, h))
+
+    def Recognize(self):
+        pass
+
+    def GetIterator(self):
+        return self.lines
+
+
+@pytest.fixture
+def stub_engine(monkeypatch):
+    def install(lines):
+        api = StubApi(lines)
+
+        @contextmanager
+        def borrowed():
+            yield api
+
+        monkeypatch.setattr(main, "_tess_api", borrowed)
+        monkeypatch.setattr(main, "iterate_level", lambda iterator, level: iter(iterator))
+        return api
+    return install
+
+
+def test_lines_are_split_back_to_images_by_offset(stub_engine):
+    stub_engine([
+        StubLine(5, "first a\n", 90),
+        StubLine(60, "first b\n", 70),
+        StubLine(140, "second\n", 80),
+        StubLine(150, None, 0),          # non-text block is skipped
+        StubLine(400, "third\n", 60),
+    ])
+    canvas = np.full((500, 50), 255, dtype=np.uint8)
+    results = main.extract_text_stacked(canvas, [0, 140, 300], main.PSM.AUTO)
+    assert results == [("first a\nfirst b\n", 80.0), ("second\n", 80.0), ("third\n", 60.0)]
+
+
+def test_image_without_lines_gets_empty_text(stub_engine):
+    stub_engine([StubLine(10, "only the first\n", 50)])
+    canvas = np.full((200, 50), 255, dtype=np.uint8)
+    assert main.extract_text_stacked(canvas, [0, 100], main.PSM.AUTO) == [
+        ("only the first\n", 50.0), ("", 0.0),
+    ]
+
+
+# ── Resizing ──────────────────────────────────────────────────────────────────
+
+def test_resize_keeps_thin_images_at_least_one_pixel():
+    # 3000x1 downscales by 2000/3000: the short side would round to 0
+    line = np.full((1, 3000), 255, dtype=np.uint8)
+    assert main._resize_for_ocr(line).shape == (1, main.OCR_MAX_LONG_SIDE)
+    assert main._resize_for_ocr(line.T).shape == (main.OCR_MAX_LONG_SIDE, 1)
+
+
+# ── Canvas grouping and stacking ──────────────────────────────────────────────
+
+def test_canvas_groups_respect_height_limit(monkeypatch):
+    monkeypatch.setattr(main, "MAX_CANVAS_HEIGHT", 250)
+    sep = main.BATCH_SEPARATOR_PX
+    # 100 + sep + 100 fits; a third image would not
+    assert 100 + sep + 100 <= 250 < 100 + sep + 100 + sep + 100
+    assert main._canvas_groups([(100, 10)] * 5) == [[0, 1], [2, 3], [4]]
+
+
+def test_canvas_groups_respect_pixel_limit(monkeypatch):
+    monkeypatch.setattr(main, "MAX_CANVAS_PIXELS", 100 * 1000)
+    # A wide image widens the whole canvas, so it starts a new one
+    assert main._canvas_groups([(40, 100), (40, 100), (40, 1000)]) == [[0, 1], [2]]
+
+
+def test_oversized_image_gets_a_canvas_of_its_own(monkeypatch):
+    monkeypatch.setattr(main, "MAX_CANVAS_HEIGHT", 250)
+    assert main._canvas_groups([(100, 10), (400, 10), (100, 10)]) == [[0], [1], [2]]
+
+
+def test_stack_places_images_on_white_canvas_at_offsets():
+    a = np.zeros((10, 4), dtype=np.uint8)
+    b = np.full((5, 6), 7, dtype=np.uint8)
+    canvas, offsets = main._stack_preprocessed([a, b], lambda gray: gray)
+    sep = main.BATCH_SEPARATOR_PX
+    assert offsets == [0, 10 + sep]
+    assert canvas.shape == (10 + sep + 5, 6)
+    assert (canvas[:10, :4] == 0).all() and (canvas[:10, 4:] == 255).all()
+    assert (canvas[10:10 + sep] == 255).all()
+    assert (canvas[10 + sep:, :] == 7).all()
+
+
+def test_multi_pass_maps_results_back_across_canvases(monkeypatch):
+    """Each image's passes must come from its own slice, whichever canvas it landed on."""
+    monkeypatch.setattr(main, "MAX_CANVAS_HEIGHT", 250)
+    canvases = []
+
+    def stub_stacked(processed, offsets, psm):
+        canvases.append(list(offsets))
+        ends = offsets[1:] + [processed.shape[0] + main.BATCH_SEPARATOR_PX]
+        # Report each image's height, recovered from its slice of the canvas
+        return [(f"height {end - start - main.BATCH_SEPARATOR_PX}", 50.0)
+                for start, end in zip(offsets, ends)]
+
+    monkeypatch.setattr(main, "extract_text_stacked", stub_stacked)
+    heights = [100, 60, 120, 80]
+    grays = [np.full((h, 30), 255, dtype=np.uint8) for h in heights]
+    results = main.extract_text_multi_pass(grays)
+
+    passes = 4 * len(main.OCR_CONFIGS)   # preprocessing variants x page-segmentation modes
+    assert [len(r) for r in results] == [passes] * 4
+    for h, image_results in zip(heights, results):
+        assert set(image_results) == {f"height {h}"}
+    # Two canvases per pass: [100, 60] and [120, 80]
+    assert len(canvases) == 2 * passes
+
+
+def test_preprocessing_failure_costs_only_the_failing_image(monkeypatch):
+    def stub_stacked(processed, offsets, psm):
+        return [("text", 50.0)] * len(offsets)
+
+    def raw_or_fail(gray):
+        if gray.shape[0] == 60:
+            raise ValueError("cannot preprocess")
+        return gray
+
+    monkeypatch.setattr(main, "extract_text_stacked", stub_stacked)
+    monkeypatch.setattr(main, "preprocess_raw", raw_or_fail)
+    grays = [np.full((h, 30), 255, dtype=np.uint8) for h in (100, 60, 120)]
+    results = main.extract_text_multi_pass(grays)
+
+    passes = 4 * len(main.OCR_CONFIGS)
+    # The stacked raw canvas fails; retried alone, only the 60px image lacks its raw passes
+    assert [len(r) for r in results] == [passes, passes - len(main.OCR_CONFIGS), passes]
+
+
+# ── /ocr/batch ────────────────────────────────────────────────────────────────
+
+@pytest.fixture
+def client(monkeypatch):
+    main._RESULT_CACHE.clear()
+    images = {
+        "ok": np.full((50, 50), 255, dtype=np.uint8),
+        "blank": np.zeros((50, 50), dtype=np.uint8),
+    }
+
+    async def stub_download(url):
+        if url == "unreachable":
+            raise HTTPException(status_code=400, detail="unreachable")
+        if url == "corrupt":
+            return b"not an image"
+        if url == "empty":
+            return b""
+        return main.cv2.imencode(".png", images[url])[1].tobytes()
+
+    def stub_multi_pass(grays, high_quality=False):
+        # White images read as a 6-line document, black ones yield no text at all
+        return [["A\nB\nC\nD\nE\nF"] if gray.mean() > 127 else [] for gray in grays]
+
+    monkeypatch.setattr(main, "download_image", stub_download)
+    monkeypatch.setattr(main, "extract_text_multi_pass", stub_multi_pass)
+    with TestClient(main.app) as c:
+        yield c
+    main._RESULT_CACHE.clear()
+
+
+def test_batch_reports_errors_per_image(client):
+    response = client.post("/ocr/batch", json={"image_urls": ["ok", "unreachable", "corrupt", "blank", "ok"]})
+    assert response.status_code == 200
+    body = response.json()
+    assert [item["error"] for item in body] == [
+        None, "unreachable", "Unsupported or corrupt image", "All OCR passes failed", None,
+    ]
+    assert body[0]["raw_text"] == body[4]["raw_text"] == "A\nB\nC\nD\nE\nF"
+    assert body[1]["raw_text"] is None
+
+
+def test_empty_body_fails_only_its_own_entry(client):
+    body = client.post("/ocr/batch", json={"image_urls": ["ok", "empty"]}).json()
+    assert [item["error"] for item in body] == [None, "Unsupported or corrupt image"]
+
+
+def test_image_failing_to_resize_fails_alone(client, monkeypatch):
+    def resize(gray):
+        if gray.mean() < 127:
+            raise ValueError("cannot resize")
+        return gray
+
+    monkeypatch.setattr(main, "_resize_for_ocr", resize)
+    body = client.post("/ocr/batch", json={"image_urls": ["ok", "blank"]}).json()
+    assert [item["error"] for item in body] == [None, "cannot resize"]
+    assert body[0]["raw_text"] == "A\nB\nC\nD\nE\nF"
+
+
+def test_single_image_errors_are_still_http_errors(client):
+    response = client.post("/ocr", json={"image_url": "corrupt"})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Unsupported or corrupt image"}
+
+
+def test_batch_size_is_capped(client):
+    urls = ["ok"] * (main.MAX_BATCH_IMAGES + 1)
+    assert client.post("/ocr/batch", json={"image_urls": urls}).status_code == 422
@@ -0,0 +1,52 @@
+"""
+decode_gray: OpenCV grayscale decode, Pillow fallback, and corrupt input.
+"""
+
+import io
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+from PIL import Image
+
+import main
+
+
+def encode(img: Image.Image, fmt: str) -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, format=fmt)
+    return buf.getvalue()
+
+
+def test_png_decodes_to_gray():
+    rgb = Image.new("RGB", (8, 6), (255, 0, 0))
+    gray = main.decode_gray(encode(rgb, "PNG"))
+    assert gray.shape == (6, 8) and gray.dtype == np.uint8
+    assert gray[0, 0] == np.asarray(rgb.convert("L"))[0, 0]
+
+
+def test_formats_opencv_cannot_read_fall_back_to_pillow(monkeypatch):
+    # Force the fallback regardless of which codecs this OpenCV build has
+    monkeypatch.setattr(main.cv2, "imdecode", lambda buf, flags: None)
+    palette = Image.new("P", (5, 4), 3)
+    gray = main.decode_gray(encode(palette, "GIF"))
+    assert gray.shape == (4, 5) and gray.dtype == np.uint8
+    assert (gray == np.asarray(palette.convert("L"))).all()
+
+
+def test_grayscale_fallback_keeps_luma_as_is(monkeypatch):
+    monkeypatch.setattr(main.cv2, "imdecode", lambda buf, flags: None)
+    luma = Image.fromarray(np.arange(12, dtype=np.uint8).reshape(3, 4))
+    assert (main.decode_gray(encode(luma, "TIFF")) == np.asarray(luma)).all()
+
+
+def test_corrupt_bytes_are_a_400():
+    with pytest.raises(HTTPException) as e:
+        main.decode_gray(b"definitely not an image")
+    assert e.value.status_code == 400
+
+
+def test_empty_body_is_a_400():
+    with pytest.raises(HTTPException) as e:
+        main.decode_gray(b"")
+    assert e.value.status_code == 400
@@ -0,0 +1,74 @@
+"""
+download_image against a local aiohttp server: size cap (declared and streamed)
+and error mapping.
+"""
+
+import asyncio
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from fastapi import HTTPException
+
+import main
+
+CAP = 1000
+
+
+async def sized(request):
+    return web.Response(body=b"x" * int(request.match_info["size"]))
+
+
+async def streamed(request):
+    # Chunked, no Content-Length: only the running byte count can catch it
+    response = web.StreamResponse()
+    response.enable_chunked_encoding()
+    await response.prepare(request)
+    for _ in range(int(request.match_info["chunks"])):
+        await response.write(b"x" * 400)
+    await response.write_eof()
+    return response
+
+
+def download(path):
+    async def scenario():
+        server = web.Application()
+        server.router.add_get("/sized/{size}", sized)
+        server.router.add_get("/streamed/{chunks}", streamed)
+        async with TestServer(server) as srv:
+            async with aiohttp.ClientSession() as session:
+                main.app.state.http = session
+                return await main.download_image(str(srv.make_url(path)))
+    return asyncio.run(scenario())
+
+
+@pytest.fixture(autouse=True)
+def small_cap(monkeypatch):
+    monkeypatch.setattr(main, "MAX_IMAGE_BYTES", CAP)
+
+
+def test_body_within_cap_is_returned():
+    assert download(f"/sized/{CAP}") == b"x" * CAP
+
+
+def test_declared_oversize_is_rejected():
+    with pytest.raises(HTTPException) as e:
+        download(f"/sized/{CAP + 1}")
+    assert e.value.status_code == 413
+
+
+def test_streamed_body_within_cap_is_returned():
+    assert download("/streamed/2") == b"x" * 800
+
+
+def test_streamed_oversize_is_rejected():
+    with pytest.raises(HTTPException) as e:
+        download("/streamed/5")
+    assert e.value.status_code == 413
+
+
+def test_http_errors_map_to_400():
+    with pytest.raises(HTTPException) as e:
+        download("/missing")
+    assert e.value.status_code == 400
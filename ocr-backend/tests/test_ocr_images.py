@@ -0,0 +1,158 @@
+"""
+ocr_images: result cache, in-flight sharing of identical images, and per-image
+error propagation. The OCR pipeline (_ocr_uncached) is replaced by a stub, so
+no Tesseract engine is needed.
+"""
+
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+import main
+
+
+class StubPipeline:
+    """Stands in for _ocr_uncached: records each call and blocks until released.
+    Images whose bytes start with b'bad' fail with a 400, like an undecodable image."""
+
+    def __init__(self):
+        self.calls = []
+        self.release = threading.Event()
+
+    def __call__(self, contents, high_quality):
+        self.calls.append(list(contents))
+        assert self.release.wait(5), "stub pipeline was never released"
+        results = [
+            HTTPException(status_code=400, detail="bad image") if content.startswith(b"bad")
+            else {"image": content}
+            for content in contents
+        ]
+        return results, sum(isinstance(r, dict) for r in results) > 1
+
+
+@pytest.fixture(autouse=True)
+def empty_caches():
+    main._RESULT_CACHE.clear()
+    main._IN_FLIGHT.clear()
+    yield
+    main._RESULT_CACHE.clear()
+    main._IN_FLIGHT.clear()
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    stub = StubPipeline()
+    monkeypatch.setattr(main, "_ocr_uncached", stub)
+    return stub
+
+
+async def _settle():
+    """Let started requests reach their await points (and register in _IN_FLIGHT)."""
+    for _ in range(5):
+        await asyncio.sleep(0.01)
+
+
+def test_concurrent_identical_images_share_one_run(pipeline):
+    async def scenario():
+        first = asyncio.ensure_future(main.ocr_images([b"a"]))
+        second = asyncio.ensure_future(main.ocr_images([b"a"]))
+        await _settle()
+        pipeline.release.set()
+        return await asyncio.gather(first, second)
+
+    first, second = asyncio.run(scenario())
+    assert first == second == [{"image": b"a"}]
+    assert pipeline.calls == [[b"a"]]
+    assert not main._IN_FLIGHT
+
+
+def test_duplicates_within_a_batch_are_recognized_once(pipeline):
+    pipeline.release.set()
+    results = asyncio.run(main.ocr_images([b"a", b"b", b"a"]))
+    assert results == [{"image": b"a"}, {"image": b"b"}, {"image": b"a"}]
+    assert pipeline.calls == [[b"a", b"b"]]
+
+
+def test_cached_result_skips_the_pipeline(pipeline):
+    pipeline.release.set()
+    asyncio.run(main.ocr_images([b"a"]))
+    assert asyncio.run(main.ocr_images([b"a"])) == [{"image": b"a"}]
+    assert len(pipeline.calls) == 1
+
+
+def test_stacked_results_are_cached_apart_from_single_image_results(pipeline):
+    pipeline.release.set()
+    asyncio.run(main.ocr_images([b"a", b"b"]))
+    asyncio.run(main.ocr_images([b"a"]))
+    assert pipeline.calls == [[b"a", b"b"], [b"a"]]
+
+
+def test_batch_reuses_single_image_results(pipeline):
+    pipeline.release.set()
+    asyncio.run(main.ocr_images([b"a"]))
+    assert asyncio.run(main.ocr_images([b"a", b"b"])) == [{"image": b"a"}, {"image": b"b"}]
+    assert pipeline.calls == [[b"a"], [b"b"]]
+
+
+def test_image_recognized_alone_is_cached_as_single(pipeline):
+    pipeline.release.set()
+    # b"b" is a cache hit and b"bad" fails to decode: b"a" is recognized on its own
+    asyncio.run(main.ocr_images([b"b"]))
+    asyncio.run(main.ocr_images([b"a", b"b"]))
+    asyncio.run(main.ocr_images([b"c", b"bad"]))
+    assert asyncio.run(main.ocr_images([b"a"])) == [{"image": b"a"}]
+    assert asyncio.run(main.ocr_images([b"c"])) == [{"image": b"c"}]
+    assert pipeline.calls == [[b"b"], [b"a"], [b"c", b"bad"]]
+
+
+def test_failure_reaches_only_the_failing_image(pipeline):
+    async def scenario():
+        # The second batch shares b"a" with the first, whose b"bad" image fails
+        failing = asyncio.ensure_future(main.ocr_images([b"a", b"bad"]))
+        await _settle()
+        sharing = asyncio.ensure_future(main.ocr_images([b"a", b"c"]))
+        await _settle()
+        pipeline.release.set()
+        return await asyncio.gather(failing, sharing)
+
+    failing, sharing = asyncio.run(scenario())
+    assert failing[0] == {"image": b"a"}
+    assert isinstance(failing[1], HTTPException) and failing[1].status_code == 400
+    assert sharing == [{"image": b"a"}, {"image": b"c"}]
+    assert pipeline.calls == [[b"a", b"bad"], [b"c"]]
+
+
+def test_errors_are_not_cached(pipeline):
+    pipeline.release.set()
+    asyncio.run(main.ocr_images([b"bad"]))
+    asyncio.run(main.ocr_images([b"bad"]))
+    assert len(pipeline.calls) == 2
+
+
+def test_cancelled_owner_does_not_cancel_shared_work(pipeline):
+    async def scenario():
+        owner = asyncio.ensure_future(main.ocr_images([b"a"]))
+        await _settle()
+        waiter = asyncio.ensure_future(main.ocr_images([b"a"]))
+        await _settle()
+        owner.cancel()   # e.g. the client that started the OCR disconnected
+        await _settle()
+        pipeline.release.set()
+        return await waiter
+
+    assert asyncio.run(scenario()) == [{"image": b"a"}]
+    assert pipeline.calls == [[b"a"]]
+    assert main._RESULT_CACHE[(main.blake3(b"a").digest(), False, False)] == {"image": b"a"}
+
+
+def test_unexpected_pipeline_error_resolves_every_image(monkeypatch):
+    def broken(contents, high_quality):
+        raise RuntimeError("engine crashed")
+
+    monkeypatch.setattr(main, "_ocr_uncached", broken)
+    results = asyncio.run(main.ocr_images([b"a", b"b"]))
+    assert [r.status_code for r in results] == [500, 500]
+    assert not main._IN_FLIGHT
+    assert not main._RESULT_CACHE
@@ -0,0 +1,142 @@
+"""
+Field extraction rules: line cleaning, validators and the orchestrator.
+"""
+
+import itertools
+import random
+import re
+import string
+
+import rules
+
+
+# ── clean_lines ───────────────────────────────────────────────────────────────
+
+def test_clean_lines_normalizes_whitespace():
+    assert rules.clean_lines('  JOHN \t  SMITH \n\x0bDOE\xa0\xa0X ') == ['JOHN SMITH', 'DOE X']
+
+
+def test_clean_lines_drops_empty_single_char_and_decorative_lines():
+    text = '\n'.join(['', '   ', 'x', '-----', '_=*.|', '| |', 'ok'])
+    assert rules.clean_lines(text) == ['| |', 'ok']
+
+
+def test_clean_lines_keeps_decoration_with_inner_spaces():
+    # Matches the original ^[-_=*.|]+$ check: a space makes the line non-decorative
+    assert rules.clean_lines('-- --\n== ==') == ['-- --', '== ==']
+
+
+# ── _clean_for_alpha ──────────────────────────────────────────────────────────
+
+def _clean_for_alpha_reference(s):
+    """The original two-pass cleaner: translate, then strip non-letters with a regex."""
+    return re.sub(r'[^A-Za-z ]', '', s.translate(rules.OCR_ALPHA_FIXES)).strip()
+
+
+def test_clean_for_alpha_fixes_digits_and_drops_the_rest():
+    assert rules._clean_for_alpha(' 5AM-0\'Br1en\t') == 'SAMOBrIen'
+    assert rules._clean_for_alpha('N3W Y0RK 9') == 'NEW YORK g'
+    assert rules._clean_for_alpha('café') == 'caf'
+
+
+def test_clean_for_alpha_matches_the_two_pass_cleaner():
+    rng = random.Random(0)
+    alphabet = [chr(c) for c in range(300)]
+    for _ in range(5000):
+        s = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 12)))
+        assert rules._clean_for_alpha(s) == _clean_for_alpha_reference(s), repr(s)
+
+
+# ── validate_address ──────────────────────────────────────────────────────────
+
+def test_validate_address_fixes_street_suffixes():
+    assert rules.validate_address('  12   Oak 5T ') == ('12 Oak ST', 1.0)
+    assert rules.validate_address('9 Elm RO') == ('9 Elm RD', 1.0)
+
+
+def test_validate_address_recovers_leading_digits():
+    assert rules.validate_address('l2l Main 4VE') == ('121 Main AVE', 0.8)
+
+
+def test_validate_address_without_street_number():
+    assert rules.validate_address('Main Street') == ('Main Street', 0.5)
+    assert rules.validate_address('   ') == ('', 0.3)
+
+
+# ── validate_state ────────────────────────────────────────────────────────────
+
+def _fuzzy_state_reference(pure):
+    """The original per-call substitution search that _STATE_NEIGHBORS replaces."""
+    for i in range(min(len(pure), 2)):
+        for c in string.ascii_uppercase:
+            candidate = pure[:i] + c + pure[i+1:]
+            if len(candidate) >= 2 and candidate[:2] in rules.VALID_STATES:
+                return candidate[:2]
+    return None
+
+
+def test_state_neighbors_never_rewrite_valid_codes():
+    assert not rules.VALID_STATES & rules._STATE_NEIGHBORS.keys()
+
+
+def test_state_neighbors_match_the_substitution_search():
+    for pair in map(''.join, itertools.product(string.ascii_uppercase, repeat=2)):
+        if pair not in rules.VALID_STATES:
+            assert rules._STATE_NEIGHBORS.get(pair) == _fuzzy_state_reference(pair), pair
+
+
+def test_validate_state():
+    assert rules.validate_state(' tx ') == ('TX', 1.0)
+    assert rules.validate_state('CAL') == ('CA', 0.9)
+    assert rules.validate_state('4Z') == ('AZ', 0.8)
+    # Fuzzy: first letter is substituted before the second, A→Z
+    assert rules.validate_state('QX') == ('TX', 0.6)
+    assert rules.validate_state('Q') == ('Q', 0.3)
+
+
+# ── extract_fields ────────────────────────────────────────────────────────────
+
+DOCUMENT = '\n'.join([
+    'JOHN', 'SMITH', 'john.smith@example.com', '123-45-6789', '(555) 123-4567',
+    'First National Bank', '123456789012', '$25,000', '42 Oak 5T', 'SPRINGFIELD',
+    'IL', '62704', '1985-04-12', 'S12345678', 'IL', '192.168.1.10',
+])
+
+
+def test_positional_extraction_of_a_clean_document():
+    result = rules.extract_fields([DOCUMENT])
+    assert result['confidence'] == 100.0
+    assert result['first_name'] == 'JOHN'
+    assert result['ssn'] == '123456789'
+    assert result['address'] == '42 Oak ST'
+    assert result['dob'] == '1985-04-12'
+    assert result['ip'] == '192.168.1.10'
+
+
+def test_duplicate_passes_do_not_change_the_result():
+    noisy = DOCUMENT.replace('SMITH', 'SM1TH').replace('62704', 'b27O4')
+    once = rules.extract_fields([noisy, DOCUMENT])
+    repeated = rules.extract_fields([noisy, noisy, DOCUMENT, noisy, DOCUMENT])
+    assert repeated == once
+
+
+def test_memoized_validation_matches_fresh_validation():
+    lines = rules.clean_lines(DOCUMENT)
+    memo = {}
+    first = rules.extract_fields_positional(lines, memo)
+    assert memo
+    assert rules.extract_fields_positional(lines, memo) == first == rules.extract_fields_positional(lines)
+
+
+def test_perfect_pass_skips_the_remaining_passes(monkeypatch):
+    cleaned = []
+    clean_lines = rules.clean_lines
+
+    def counting_clean_lines(text):
+        cleaned.append(text)
+        return clean_lines(text)
+
+    monkeypatch.setattr(rules, "clean_lines", counting_clean_lines)
+    noisy = DOCUMENT.replace('SMITH', 'SM1TH')
+    assert rules.extract_fields([DOCUMENT, noisy, noisy + '\nextra'])['confidence'] == 100.0
+    assert cleaned == [DOCUMENT]